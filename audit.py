@@ -0,0 +1,218 @@
+"""
+Library-wide compliance audit (report only, nothing is changed)
+"""
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from directory_index import DirectoryIndex, pinned_indexes
+from media_handler import MediaHandler, PLAN_BITMAP, find_subtitle_paths
+from processing_queue import MEDIA_EXTENSIONS
+from mp4_layout import describe_startup_read, format_startup_read
+from subtitle_utils import find_duplicate_files
+from tv_profile import plan_conversion
+
+
+# Number of files analyzed at the same time (each may run one ffprobe)
+DEFAULT_AUDIT_WORKERS = max(4, (os.cpu_count() or 1) * 2)
+
+# A normalized subtitle name: basename.xx.srt or basename.xx-N.srt
+NORMALIZED_TAG = re.compile(r'^[a-z]{2}(-\d+)?$')
+
+# Any language-looking tag: basename.xxx.srt, basename.xxx-N.srt
+LANGUAGE_TAG = re.compile(r'^([A-Za-z]{2,3})(-\d+)?$')
+
+
+def iter_library_directories(root):
+    """
+    Walk a library, listing every directory exactly once.
+    
+    Yields:
+        tuple: (directory, list of filenames in it, DirectoryIndex built
+            from the same listing)
+    """
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        filenames = []
+        subdirectories = []
+        names = []
+        try:
+            # Stat before the scan, as DirectoryIndex.rebuild does
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    names.append(entry.name)
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    elif entry.is_file():
+                        filenames.append(entry.name)
+        except OSError as e:
+            print(f"Cannot list {directory}: {e}")
+            continue
+        
+        yield directory, filenames, DirectoryIndex(directory, names, mtime_ns)
+        pending.extend(sorted(subdirectories, reverse=True))
+
+
+def audit_library(roots, workers=DEFAULT_AUDIT_WORKERS, progress_callback=None,
+                  sample_languages=False):
+    """
+    Report every media file the Samsung TV is likely to struggle with.
+    
+    Args:
+        roots: List of library directories (or single media files)
+        workers: Number of files analyzed at the same time, which bounds the
+            number of concurrent ffprobe processes
+        progress_callback: Optional callable receiving (done, total)
+        sample_languages: Identify untagged text tracks from a few windows
+            of their cues (bounded ffmpeg reads)
+    
+    Returns:
+        list: One dict per media file with problems, with 'path' and
+            'issues' keys; each issue is a dict with 'code' and 'detail'
+    """
+    tasks = []
+    indexes = []
+    for root in roots:
+        if os.path.isfile(root):
+            tasks.append(root)
+            continue
+        
+        for directory, filenames, index in iter_library_directories(root):
+            indexes.append(index)
+            for filename in sorted(filenames):
+                if filename.lower().endswith(MEDIA_EXTENSIONS):
+                    tasks.append(os.path.join(directory, filename))
+    
+    print(f"Auditing {len(tasks)} media file(s) with {workers} worker(s)")
+    
+    # Subtitle lookups use the walk's listings, for the whole audit
+    with pinned_indexes(indexes):
+        return _audit_files(tasks, workers, progress_callback, sample_languages)
+
+
+def _audit_files(tasks, workers, progress_callback, sample_languages):
+    """Audit media files in parallel (see audit_library)."""
+    # Detect every subtitle's language in one batch; audit_file then hits the cache
+    media_handler = MediaHandler()
+    subtitle_paths = []
+    for file_path in tasks:
+        try:
+            subtitle_paths.extend(find_subtitle_paths(file_path))
+        except OSError as e:
+            print(f"Cannot list subtitles of {file_path}: {e}")
+    media_handler.detect_subtitle_languages(subtitle_paths)
+    
+    report = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda file_path: audit_file(media_handler, file_path, sample_languages), tasks)
+        for done, (path, issues) in enumerate(results, 1):
+            if issues:
+                report.append({'path': path, 'issues': issues})
+            if progress_callback is not None:
+                progress_callback(done, len(tasks))
+    
+    return report
+
+
+def audit_file(media_handler, file_path, sample_languages=False):
+    """
+    Audit a single media file.
+    
+    Args:
+        media_handler: MediaHandler used for probing and language detection
+        file_path: Path of the video file
+        sample_languages: Identify untagged text tracks from samples of their cues
+    
+    Returns:
+        tuple: (file_path, list of issue dicts)
+    """
+    issues = []
+    basename = os.path.splitext(os.path.basename(file_path))[0]
+    
+    def add(code, detail):
+        issues.append({'code': code, 'detail': detail})
+    
+    embedded_subs = media_handler._get_embedded_subtitles(file_path)
+    if sample_languages:
+        media_handler.identify_untagged_tracks(file_path, embedded_subs)
+    
+    for sub in embedded_subs:
+        if sub['language'] == 'und':
+            add('untagged-subtitle', f"subtitle stream {sub['index']} has no language tag")
+        elif sub['sampled']:
+            add('untagged-subtitle', f"subtitle stream {sub['index']} has no language tag, cues look like '{sub['language']}'")
+    
+    if file_path.lower().endswith('.mkv'):
+        if embedded_subs:
+            languages = ', '.join(f"{sub['language']} ({sub['codec']})" for sub in embedded_subs)
+            add('mkv-embedded-subtitles', f"MKV with {len(embedded_subs)} embedded subtitle(s): {languages}")
+        else:
+            add('mkv-container', "MKV container (convert to MP4)")
+    else:
+        if embedded_subs:
+            add('embedded-subtitles', f"{len(embedded_subs)} embedded subtitle(s)")
+        
+        try:
+            startup_read = describe_startup_read(file_path)
+        except (OSError, ValueError):
+            startup_read = None
+        if startup_read is not None and not startup_read['front_loaded']:
+            add('moov-at-end', f"moov atom at the end, TV startup read: {format_startup_read(startup_read)}")
+    
+    try:
+        plan = plan_conversion(media_handler.probe(file_path))
+    except Exception:
+        plan = None
+    if plan is not None:
+        for entry in plan['audio']:
+            if entry['transcode']:
+                add('incompatible-audio', f"audio stream {entry['index']}: {entry['reason']}")
+        for warning in plan['video_warnings']:
+            add('incompatible-video', warning)
+    
+    bitmap_subs = [sub for sub in embedded_subs if sub['plan'] == PLAN_BITMAP]
+    if bitmap_subs:
+        add('bitmap-subtitles', f"{len(bitmap_subs)} bitmap subtitle(s) that cannot be converted to SRT")
+    
+    external_subs = media_handler._get_external_subtitles(file_path)
+    
+    for sub in external_subs:
+        tag = sub['filename'][len(basename):-len('.srt')].lstrip('.')
+        match = LANGUAGE_TAG.match(tag)
+        
+        if match and len(match.group(1)) == 3:
+            add('three-letter-language-tag', f"{sub['filename']}: 3-letter language tag")
+        elif not NORMALIZED_TAG.match(tag):
+            add('unnormalized-subtitle-name', f"{sub['filename']}: not named {basename}.<lang>.srt")
+        elif sub['language'] != 'und' and not tag.startswith(sub['language']):
+            add('subtitle-language-mismatch', f"{sub['filename']}: content looks like '{sub['language']}'")
+    
+    for group in find_duplicate_files([sub['path'] for sub in external_subs]):
+        names = ', '.join(os.path.basename(path) for path in group)
+        add('duplicate-subtitles', f"Identical subtitles: {names}")
+    
+    return file_path, issues
+
+
+def format_report(report):
+    """Format an audit report as human-readable text."""
+    lines = []
+    counts = defaultdict(int)
+    
+    for entry in report:
+        lines.append(entry['path'])
+        for issue in entry['issues']:
+            counts[issue['code']] += 1
+            lines.append(f"  [{issue['code']}] {issue['detail']}")
+    
+    lines.append("")
+    lines.append(f"{len(report)} file(s) with issues")
+    for code, count in sorted(counts.items()):
+        lines.append(f"  {code}: {count}")
+    
+    return '\n'.join(lines)
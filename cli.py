@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Samsung TV Media File Converter
+Headless command-line entry point (no GTK or display needed)
+"""
+import os
+import sys
+import json
+import shutil
+import signal
+import argparse
+import threading
+import contextlib
+
+from audit import audit_library, format_report, DEFAULT_AUDIT_WORKERS
+from directory_index import record_file_removed
+from metrics import configure_metrics
+from processing_queue import ProcessingQueue, QueueJob, DEFAULT_MAX_WORKERS
+from trash import move_to_trash
+from watch_folder import IncomingFolderWatcher, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_TIME
+
+
+def check_dependencies(args):
+    """Check if the external tools needed by a command are installed."""
+    if args.command == 'audit' and not args.sample_languages:
+        tools = ('ffprobe',)
+    else:
+        tools = ('ffmpeg', 'ffprobe')
+    return [tool for tool in tools if not shutil.which(tool)]
+
+
+def make_release_source(policy):
+    """
+    Build the callable that disposes of a converted MKV.
+    
+    Args:
+        policy: 'trash' (move to the volume's .Trash, keep if there is none),
+            'delete' (remove permanently) or 'keep'
+    """
+    def release_source(mkv_path):
+        if policy == 'keep':
+            print(f"Keeping {mkv_path}")
+        elif policy == 'delete':
+            print(f"Deleting {mkv_path}")
+            os.remove(mkv_path)
+            record_file_removed(mkv_path)
+        elif move_to_trash(mkv_path) is None:
+            print(f"No .Trash folder found, keeping {mkv_path}")
+    
+    return release_source
+
+
+def make_update_printer():
+    """Build a queue listener that prints state changes and sparse progress."""
+    last_reported = {}
+    
+    def on_update(job):
+        name = os.path.basename(job.path)
+        # Report progress in 10% steps, everything else as it happens
+        key = (job.status, int(job.fraction * 10))
+        if last_reported.get(job.id) == key:
+            return
+        last_reported[job.id] = key
+        
+        if job.state == QueueJob.RUNNING and job.fraction:
+            print(f"[{job.id}] {name}: {job.status} {job.fraction * 100:.0f}%")
+        else:
+            print(f"[{job.id}] {name}: {job.status}")
+    
+    return on_update
+
+
+def run_process(args):
+    """Process the given files and directories, then exit."""
+    queue = ProcessingQueue(
+        make_release_source(args.delete_mkv),
+        make_update_printer(),
+        max_workers=args.jobs,
+        normalized_dedup=args.normalized_dedup
+    )
+    
+    jobs = queue.add(args.paths)
+    if not jobs:
+        print("No MKV or MP4 files found")
+        return 1
+    
+    stop_event = threading.Event()
+    _install_signal_handlers(queue, stop_event)
+    
+    try:
+        while queue.is_busy():
+            stop_event.wait(0.5)
+    finally:
+        queue.shutdown(wait=True)
+    
+    failed = [job for job in jobs if job.state != QueueJob.DONE]
+    print(f"Processed {len(jobs) - len(failed)}/{len(jobs)} file(s)")
+    for job in failed:
+        print(f"  {job.path}: {job.status}")
+    
+    return 1 if failed else 0
+
+
+def run_watch(args):
+    """Watch an incoming folder and process new files until interrupted."""
+    if not os.path.isdir(args.folder):
+        print(f"Not a directory: {args.folder}")
+        return 1
+    
+    queue = ProcessingQueue(
+        make_release_source(args.delete_mkv),
+        make_update_printer(),
+        max_workers=args.jobs,
+        normalized_dedup=args.normalized_dedup
+    )
+    watcher = IncomingFolderWatcher(queue, args.folder, args.interval, args.settle)
+    
+    stop_event = threading.Event()
+    _install_signal_handlers(queue, stop_event)
+    
+    try:
+        watcher.run(stop_event)
+    finally:
+        queue.shutdown(wait=True)
+    
+    return 0
+
+
+def run_audit(args):
+    """Report files the TV will struggle with, without changing anything."""
+    def on_progress(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"Audited {done}/{total}", file=sys.stderr)
+    
+    # Keep stdout for the report so --json output can be piped
+    with contextlib.redirect_stdout(sys.stderr):
+        report = audit_library(args.paths, args.workers, on_progress, args.sample_languages)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    
+    return 0
+
+
+def _install_signal_handlers(queue, stop_event):
+    """Cancel running jobs and stop on SIGINT/SIGTERM."""
+    def handle_signal(signum, frame):
+        print("Stopping...")
+        stop_event.set()
+        queue.cancel_all()
+    
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+
+def build_parser():
+    """Build the command-line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Make media files playable on the Samsung TV without a display."
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    metrics = argparse.ArgumentParser(add_help=False)
+    metrics.add_argument(
+        '--metrics-log', metavar='PATH',
+        help="append the timing of every stage (probe, detect, remux...) to this JSON lines file"
+    )
+    metrics.add_argument(
+        '--metrics-textfile', metavar='PATH',
+        help="keep per-stage totals in this Prometheus textfile-collector file (*.prom)"
+    )
+    
+    common = argparse.ArgumentParser(add_help=False, parents=[metrics])
+    common.add_argument(
+        '--delete-mkv', choices=['trash', 'delete', 'keep'], default='trash',
+        help="what to do with a converted MKV (default: move to .Trash, keep if there is none)"
+    )
+    common.add_argument(
+        '--jobs', type=int, default=DEFAULT_MAX_WORKERS,
+        help=f"files processed at the same time (default: {DEFAULT_MAX_WORKERS})"
+    )
+    common.add_argument(
+        '--normalized-dedup', action='store_true',
+        help="treat subtitles differing only by BOM, line endings or trailing whitespace as duplicates"
+    )
+    
+    process = subparsers.add_parser(
+        'process', parents=[common],
+        help="process files, or all media files found in directories"
+    )
+    process.add_argument('paths', nargs='+', help="MKV/MP4 files or directories")
+    process.set_defaults(func=run_process)
+    
+    watch = subparsers.add_parser(
+        'watch', parents=[common],
+        help="watch an incoming folder and process files once they stop growing"
+    )
+    watch.add_argument('folder', help="folder to watch (recursively)")
+    watch.add_argument(
+        '--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+        help=f"seconds between scans (default: {DEFAULT_POLL_INTERVAL})"
+    )
+    watch.add_argument(
+        '--settle', type=float, default=DEFAULT_SETTLE_TIME,
+        help=f"seconds a file must stay unchanged before processing (default: {DEFAULT_SETTLE_TIME})"
+    )
+    watch.set_defaults(func=run_watch)
+    
+    audit = subparsers.add_parser(
+        'audit', parents=[metrics],
+        help="report files the TV will struggle with, without changing anything"
+    )
+    audit.add_argument('paths', nargs='+', help="library directories or media files")
+    audit.add_argument(
+        '--workers', type=int, default=DEFAULT_AUDIT_WORKERS,
+        help=f"files analyzed (and ffprobe processes run) at the same time (default: {DEFAULT_AUDIT_WORKERS})"
+    )
+    audit.add_argument(
+        '--sample-languages', action='store_true',
+        help="identify untagged text subtitle tracks from a few short windows of their cues"
+    )
+    audit.add_argument('--json', action='store_true', help="print the report as JSON")
+    audit.set_defaults(func=run_audit)
+    
+    return parser
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    args = build_parser().parse_args(argv)
+    
+    missing = check_dependencies(args)
+    if missing:
+        print(f"ERROR: Missing dependencies: {missing}")
+        return 1
+    
+    configure_metrics(args.metrics_log, args.metrics_textfile)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,57 @@
 """
 MKV to MP4 conversion with subtitle extraction
 """
+import io
 import os
 import subprocess
-import json
-from media_handler import MediaHandler
+import threading
+from media_handler import MediaHandler, PLAN_EXTRACT, PLAN_LABELS, sample_subtitle_text
+from ffmpeg_progress import ConversionCancelled, run_ffmpeg
+from subtitle_utils import get_file_digest, hash_bytes
+from mp4_layout import (
+    FASTSTART_RESERVE, FASTSTART_RELOCATE, MOOV_TOO_SMALL_MESSAGE, get_faststart_options,
+    describe_startup_read, moov_at_end_equivalent, format_startup_read
+)
+from tv_profile import plan_conversion, get_audio_options, get_codec_overrides, describe_plan
+from directory_index import get_directory_index, record_file_added, record_file_removed, tracking_changes
+from job_journal import (
+    STAGE_PROBE, STAGE_REMUX, STAGE_EXTRACT, get_temp_path, write_new_file_atomically
+)
+from probe_cache import file_identity
+from metrics import stage_span
 
 
-def convert_mkv_to_mp4(mkv_path):
+def convert_mkv_to_mp4(mkv_path, cancel_event=None, progress_callback=None,
+                       faststart=FASTSTART_RESERVE, journal=None):
     """
     Convert MKV file to MP4 and extract embedded subtitles.
     
+    The video/audio remux and every subtitle extraction are done by a single
+    ffmpeg invocation, so the source file is read only once. Subtitle tracks
+    are captured in memory and only the ones not already present as external
+    subtitles are written, directly to their final .lang.srt names. Only
+    streams planned for extraction (text codecs) are mapped; bitmap tracks
+    never cost a read.
+    
+    Video is always stream-copied; audio streams the TV cannot play (see
+    tv_profile.SAMSUNG_PROFILE) are transcoded, every other stream is copied.
+    By default the moov atom is written at the front of the MP4 (into space
+    reserved from an estimate of its size), so the TV can start playback
+    without seeking to the end of the file.
+    
+    Every output is written under a temporary name and renamed into place
+    once complete, so a crash never leaves a truncated MP4 or subtitle.
+    With a journal, stages finished by an earlier, interrupted run are
+    skipped.
+    
     Args:
         mkv_path: Path to the MKV file
+        cancel_event: Optional threading.Event; when set, ffmpeg is stopped,
+            partial outputs are removed and ConversionCancelled is raised
+        progress_callback: Optional callable receiving progress dicts
+            (see ffmpeg_progress.iter_ffmpeg_progress)
+        faststart: moov placement, one of the mp4_layout.FASTSTART_* modes
+        journal: Optional JobJournal of the MKV
     
     Returns:
         str: Path to the output MP4 file
@@ -23,95 +62,453 @@ def convert_mkv_to_mp4(mkv_path):
     basename = os.path.splitext(os.path.basename(mkv_path))[0]
     output_mp4 = os.path.join(directory, f"{basename}.mp4")
     
-    # Extract subtitles first
-    extract_subtitles(mkv_path)
+    remux_done = _is_remux_done(journal, output_mp4)
+    if remux_done and journal.is_done(STAGE_EXTRACT):
+        print(f"Conversion already done: {output_mp4}")
+        return output_mp4
     
-    # Convert video to MP4
-    print(f"Converting video to MP4: {output_mp4}")
-    cmd = [
-        'ffmpeg',
-        '-i', mkv_path,
-        '-map', '0:v',  # Map video streams
-        '-map', '0:a',  # Map audio streams
-        '-codec', 'copy',  # Copy without re-encoding
-        '-y',  # Overwrite output file
-        output_mp4
-    ]
+    # Get subtitle stream information
+    media_handler = MediaHandler()
+    embedded_subs, external_subs = media_handler.analyze_file(mkv_path)
+    duration = media_handler.get_duration(mkv_path)
+    subs_to_extract = plan_subtitle_extraction(embedded_subs)
+    if journal is not None and not journal.is_done(STAGE_PROBE):
+        journal.complete(STAGE_PROBE)
     
-    print(f"Running: {' '.join(cmd)}")
+    if remux_done:
+        # Interrupted after the remux: only the subtitles are missing
+        print(f"Remux already done, extracting subtitles only: {output_mp4}")
+        with stage_span(STAGE_EXTRACT, mkv_path):
+            extracted = _capture_subtitles(mkv_path, subs_to_extract, cancel_event, duration,
+                                           progress_callback)
+    else:
+        # Includes capturing the subtitle tracks, done in the same ffmpeg run
+        with stage_span(STAGE_REMUX, mkv_path) as span:
+            extracted = _remux_and_capture(media_handler, mkv_path, output_mp4, subs_to_extract,
+                                           faststart, cancel_event, duration, progress_callback)
+            span.add_file_size(output_mp4)
+        if journal is not None:
+            journal.complete(STAGE_REMUX, {'output': output_mp4, 'identity': list(file_identity(output_mp4))})
+    
+    _report_startup_read(output_mp4)
+    with stage_span(STAGE_EXTRACT, mkv_path) as span:
+        span.add_bytes(sum(len(data) for data in extracted.values()))
+        written = store_extracted_subtitles(mkv_path, subs_to_extract, extracted, external_subs)
+    if journal is not None:
+        journal.complete(STAGE_EXTRACT, [os.path.basename(path) for path in written])
+    
+    return output_mp4
+
+
+def _is_remux_done(journal, output_mp4):
+    """Check if the journal records a remux whose MP4 is still intact."""
+    if journal is None or not journal.is_done(STAGE_REMUX):
+        return False
+    
+    identity = file_identity(output_mp4)
+    return identity is not None and list(identity) == journal.get(STAGE_REMUX).get('identity')
+
+
+def _remux_and_capture(media_handler, mkv_path, output_mp4, subs_to_extract, faststart,
+                       cancel_event=None, duration=None, progress_callback=None):
+    """
+    Write the MP4 (atomically) and capture the subtitle tracks.
+    
+    Returns:
+        dict: stream index -> captured SRT bytes
+    """
+    temp_mp4 = get_temp_path(output_mp4)
+    
+    # Transcode only the audio streams the TV cannot play
+    probe_data = _probe_source(media_handler, mkv_path)
+    plan = plan_conversion(probe_data)
+    print(f"Conversion plan: {describe_plan(plan)}")
+    audio_options = get_audio_options(plan)
+    output_options = audio_options + get_faststart_options(faststart, probe_data, get_codec_overrides(plan))
+    
+    # Remux video/audio and capture all subtitles in one pass
+    print(f"Converting video to MP4: {output_mp4}")
     
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        try:
+            extracted = _convert_single_pass(mkv_path, temp_mp4, subs_to_extract, output_options,
+                                             cancel_event, duration, progress_callback)
+        except subprocess.CalledProcessError as e:
+            if MOOV_TOO_SMALL_MESSAGE not in e.stderr:
+                raise
+            print("Reserved moov space too small, moving the moov atom after the remux instead")
+            output_options = audio_options + get_faststart_options(FASTSTART_RELOCATE)
+            extracted = _convert_single_pass(mkv_path, temp_mp4, subs_to_extract, output_options,
+                                             cancel_event, duration, progress_callback)
         print("Video conversion complete")
-        print(result.stderr[-500:] if len(result.stderr) > 500 else result.stderr)
+    except ConversionCancelled:
+        _remove_partial_outputs([temp_mp4])
+        raise
     except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e.stderr}")
-        raise Exception(f"Video conversion failed: {e.stderr[-500:]}")
+        if not subs_to_extract:
+            _remove_partial_outputs([temp_mp4])
+            print(f"FFmpeg error: {e.stderr}")
+            raise Exception(f"Video conversion failed: {e.stderr[-500:]}")
+        
+        # One bad subtitle track aborts the whole multi-output command.
+        # Fall back to one ffmpeg run per stream so the other tracks survive.
+        print(f"Single-pass conversion failed, retrying stream by stream: {e.stderr[-500:]}")
+        try:
+            extracted = _extract_streams_separately(mkv_path, subs_to_extract, cancel_event)
+            _remux_video_audio(mkv_path, temp_mp4, cancel_event, duration, progress_callback,
+                               output_options)
+        except BaseException:
+            _remove_partial_outputs([temp_mp4])
+            raise
     
-    return output_mp4
+    os.replace(temp_mp4, output_mp4)
+    record_file_added(output_mp4)
+    return extracted
+
+
+def _capture_subtitles(mkv_path, subs_to_extract, cancel_event=None, duration=None,
+                       progress_callback=None):
+    """
+    Capture the subtitle tracks without writing an MP4.
+    
+    Returns:
+        dict: stream index -> captured SRT bytes
+    """
+    if not subs_to_extract:
+        return {}
+    
+    try:
+        return _convert_single_pass(mkv_path, None, subs_to_extract, [], cancel_event,
+                                    duration, progress_callback)
+    except subprocess.CalledProcessError as e:
+        print(f"Subtitle extraction failed, retrying stream by stream: {e.stderr[-500:]}")
+        return _extract_streams_separately(mkv_path, subs_to_extract, cancel_event)
 
 
-def extract_subtitles(mkv_path):
+def _convert_single_pass(mkv_path, output_mp4, subs_to_extract, output_options,
+                         cancel_event=None, duration=None, progress_callback=None):
     """
-    Extract all subtitle streams from MKV file.
+    Remux the MP4 and capture the subtitle tracks with one ffmpeg run.
+    
+    Args:
+        output_mp4: Path the MP4 is written to, or None for subtitles only
+    
+    Returns:
+        dict: stream index -> captured SRT bytes
+    
+    Raises:
+        ConversionCancelled: If cancel_event was set
+        subprocess.CalledProcessError: If ffmpeg failed
+    """
+    pipes = SubtitlePipes([sub['index'] for sub in subs_to_extract])
+    cmd = build_conversion_command(mkv_path, output_mp4, pipes.targets, output_options)
+    
+    print(f"Running: {' '.join(cmd)}")
+    
+    try:
+        run_ffmpeg(cmd, duration, progress_callback, cancel_event, pipes.write_fds)
+    finally:
+        extracted = pipes.collect()
+    
+    return extracted
+
+
+def _probe_source(media_handler, mkv_path):
+    """Get the ffprobe data of the source, or an empty dict if probing fails."""
+    try:
+        return media_handler.probe(mkv_path)
+    except Exception as e:
+        print(f"Could not probe {mkv_path}: {e}")
+        return {}
+
+
+def _report_startup_read(output_mp4):
+    """Print how much the TV must read before playback, with and without faststart."""
+    try:
+        startup_read = describe_startup_read(output_mp4)
+    except (OSError, ValueError) as e:
+        print(f"Could not read MP4 layout of {output_mp4}: {e}")
+        return
+    
+    if startup_read is None:
+        return
+    
+    if startup_read['front_loaded']:
+        before = format_startup_read(moov_at_end_equivalent(startup_read))
+        print(f"Startup read: {format_startup_read(startup_read)} (moov at the end: {before})")
+    else:
+        print(f"Startup read: {format_startup_read(startup_read)} (moov at the end)")
+
+
+def plan_subtitle_extraction(embedded_subs):
+    """
+    Select the embedded subtitles worth extracting, logging the others.
+    
+    Args:
+        embedded_subs: List of embedded subtitle dicts from MediaHandler
+    
+    Returns:
+        list: The subtitle dicts whose plan is PLAN_EXTRACT
+    """
+    subs_to_extract = []
+    for sub in embedded_subs:
+        if sub['plan'] == PLAN_EXTRACT:
+            subs_to_extract.append(sub)
+        else:
+            print(f"  Subtitle stream {sub['index']} ({sub['language']}, {sub['codec']}): {PLAN_LABELS[sub['plan']]}")
+    return subs_to_extract
+
+
+def build_conversion_command(mkv_path, output_mp4, subtitle_targets, output_options=()):
+    """
+    Build a single multi-output ffmpeg command.
+    
+    The first output is the MP4 (video and audio stream-copied), followed by
+    one SRT output per subtitle target.
     
     Args:
         mkv_path: Path to the MKV file
+        output_mp4: Path to the MP4 output, or None for subtitles only
+        subtitle_targets: List of dicts with 'index' and 'output' keys
+            (a file path or an ffmpeg 'pipe:N' URL)
+        output_options: Extra ffmpeg options for the MP4 output (faststart)
+    
+    Returns:
+        list: ffmpeg argument list
     """
-    print(f"Extracting subtitles from: {mkv_path}")
+    cmd = [
+        'ffmpeg',
+        '-y',  # Overwrite output files
+        '-i', mkv_path
+    ]
+    
+    if output_mp4 is not None:
+        cmd += [
+            '-map', '0:v',  # Map video streams
+            '-map', '0:a',  # Map audio streams
+            '-codec', 'copy',  # Copy without re-encoding
+            *output_options,
+            '-f', 'mp4',  # Output may have a temporary name
+            output_mp4
+        ]
+    
+    for target in subtitle_targets:
+        cmd += [
+            '-map', f"0:{target['index']}",
+            '-c:s', 'srt',  # Convert to SRT format
+            '-f', 'srt',
+            target['output']
+        ]
+    
+    return cmd
+
+
+class SubtitlePipes:
+    """
+    One OS pipe per subtitle stream, drained into memory by reader threads.
     
+    ffmpeg writes each track to 'pipe:N' (the pipe's write end); call
+    collect() once ffmpeg has exited to get the captured bytes.
+    """
+    
+    def __init__(self, stream_indices):
+        """
+        Args:
+            stream_indices: ffmpeg stream indexes of the subtitle tracks
+        """
+        self.targets = []
+        self.write_fds = []
+        self._data = {}
+        self._readers = []
+        
+        for index in stream_indices:
+            read_fd, write_fd = os.pipe()
+            self.targets.append({'index': index, 'output': f"pipe:{write_fd}"})
+            self.write_fds.append(write_fd)
+            
+            reader = threading.Thread(target=self._drain, args=(index, read_fd), daemon=True)
+            reader.start()
+            self._readers.append(reader)
+    
+    def collect(self):
+        """
+        Close our write ends and wait for the readers.
+        
+        Returns:
+            dict: stream index -> captured bytes
+        """
+        for write_fd in self.write_fds:
+            os.close(write_fd)
+        self.write_fds = []
+        
+        for reader in self._readers:
+            reader.join()
+        self._readers = []
+        
+        return self._data
+    
+    def _drain(self, index, read_fd):
+        """Read one pipe to EOF."""
+        with os.fdopen(read_fd, 'rb') as pipe:
+            self._data[index] = pipe.read()
+
+
+def store_extracted_subtitles(mkv_path, embedded_subs, extracted, external_subs):
+    """
+    Write the unique extracted subtitle tracks to their final names.
+    
+    Tracks whose content already exists (as an external subtitle or as an
+    earlier track) are dropped without touching the disk. Untagged tracks
+    get their language from the content. The external file holding each
+    track is remembered, so later runs plan those streams as already
+    extracted.
+    
+    Args:
+        mkv_path: Path to the MKV file the tracks come from
+        embedded_subs: List of embedded subtitle dicts from MediaHandler
+        extracted: dict of stream index -> SRT bytes
+        external_subs: List of external subtitle dicts already on disk
+    
+    Returns:
+        list: Paths of the subtitle files written
+    """
     directory = os.path.dirname(mkv_path)
     basename = os.path.splitext(os.path.basename(mkv_path))[0]
     
-    # Get subtitle stream information
     media_handler = MediaHandler()
-    embedded_subs, _ = media_handler.analyze_file(mkv_path)
+    known_hashes = {}
+    for sub in external_subs:
+        known_hashes.setdefault(get_file_digest(sub['path']), sub['filename'])
     
-    if not embedded_subs:
-        print("No embedded subtitles found")
-        return
+    written = []
+    stored = {}  # stream index -> filename holding its content
     
-    # Extract each subtitle stream
-    for i, sub in enumerate(embedded_subs):
-        language = sub['language']
+    for sub in embedded_subs:
         stream_index = sub['index']
+        data = extracted.get(stream_index)
         
-        # Generate output filename
-        output_file = get_unique_subtitle_path(directory, basename, language)
+        if not data:
+            print(f"  Error extracting subtitle stream {stream_index}: no data")
+            continue
         
-        print(f"Extracting subtitle stream {stream_index} ({language}) to: {output_file}")
+        digest = hash_bytes(data)
+        if digest in known_hashes:
+            print(f"  Skipping subtitle stream {stream_index}: same as {known_hashes[digest]}")
+            stored[stream_index] = known_hashes[digest]
+            continue
         
-        cmd = [
-            'ffmpeg',
-            '-i', mkv_path,
-            '-map', f"0:{stream_index}",
-            '-c:s', 'srt',  # Convert to SRT format
-            '-y',  # Overwrite
-            output_file
-        ]
+        language = sub['language']
+        if language == 'und':
+            sample = sample_subtitle_text(io.BytesIO(data), len(data))
+            language = media_handler.detect_text_language(sample)
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            print(f"  Extracted: {os.path.basename(output_file)}")
+            output_file = _write_new_subtitle(directory, basename, language, data)
+        except OSError as e:
+            print(f"  Error writing {basename}.{language} subtitle: {e}")
+            continue
+        
+        print(f"  Extracted subtitle stream {stream_index} ({language}): {os.path.basename(output_file)}")
+        known_hashes[digest] = os.path.basename(output_file)
+        stored[stream_index] = os.path.basename(output_file)
+        written.append(output_file)
+    
+    media_handler.record_extracted_subtitles(mkv_path, stored)
+    
+    return written
+
+
+def _remux_video_audio(mkv_path, output_mp4, cancel_event=None, duration=None,
+                       progress_callback=None, output_options=()):
+    """Remux only the video and audio streams into the MP4."""
+    cmd = build_conversion_command(mkv_path, output_mp4, [], output_options)
+    
+    print(f"Running: {' '.join(cmd)}")
+    
+    try:
+        run_ffmpeg(cmd, duration, progress_callback, cancel_event)
+        print("Video conversion complete")
+    except subprocess.CalledProcessError as e:
+        print(f"FFmpeg error: {e.stderr}")
+        raise Exception(f"Video conversion failed: {e.stderr[-500:]}")
+
+
+def _remove_partial_outputs(paths):
+    """Remove files left behind by a failed or cancelled run."""
+    for path in paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                record_file_removed(path)
+        except OSError as e:
+            print(f"  Error removing partial output {path}: {e}")
+
+
+def _extract_streams_separately(mkv_path, embedded_subs, cancel_event=None):
+    """
+    Capture subtitle streams into memory with one ffmpeg run per stream.
+    
+    This is the slow fallback used when the single-pass conversion fails:
+    a stream that cannot be extracted is skipped without affecting the others.
+    
+    Returns:
+        dict: stream index -> SRT bytes, for the streams that succeeded
+    """
+    extracted = {}
+    
+    for sub in embedded_subs:
+        stream_index = sub['index']
+        print(f"Extracting subtitle stream {stream_index} ({sub['language']})")
+        
+        pipes = SubtitlePipes([stream_index])
+        cmd = build_conversion_command(mkv_path, None, pipes.targets)
+        
+        try:
+            run_ffmpeg(cmd, cancel_event=cancel_event, pass_fds=pipes.write_fds)
+            extracted.update(pipes.collect())
+        except ConversionCancelled:
+            pipes.collect()
+            raise
         except subprocess.CalledProcessError as e:
+            pipes.collect()
             print(f"  Error extracting subtitle: {e.stderr}")
             # Continue with other subtitles even if one fails
+    
+    return extracted
+
+
+def _write_new_subtitle(directory, basename, language, data):
+    """
+    Write subtitle data under the first free basename.lang[-N].srt name.
+    
+    Names come from the directory index; a name taken behind its back is
+    never overwritten: the index is re-read and the next name tried.
+    
+    Returns:
+        str: Path of the file written
+    
+    Raises:
+        OSError: If writing fails
+    """
+    while True:
+        output_file = get_unique_subtitle_path(directory, basename, language)
+        try:
+            with tracking_changes(directory):
+                write_new_file_atomically(output_file, data)
+                record_file_added(output_file)
+            return output_file
+        except FileExistsError:
+            print(f"  {os.path.basename(output_file)} appeared meanwhile, trying the next name")
+            # Recorded outside tracking_changes(): the index is re-read
+            record_file_added(output_file)
 
 
 def get_unique_subtitle_path(directory, basename, language):
     """
     Get a unique subtitle file path, adding -1, -2, etc. if file exists.
     
+    Existing names are looked up in the directory index, not on disk.
+    
     Args:
         directory: Directory path
         basename: Base filename without extension
@@ -120,17 +517,22 @@ def get_unique_subtitle_path(directory, basename, language):
     Returns:
         str: Unique file path
     """
+    index = get_directory_index(directory or '.')
+    taken = set(index.with_prefix(f"{basename}.{language}"))
+    
     # Try base name first
-    output_file = os.path.join(directory, f"{basename}.{language}.srt")
+    filename = f"{basename}.{language}.srt"
+    output_file = os.path.join(directory, filename)
     
-    if not os.path.exists(output_file):
+    if filename not in taken:
         return output_file
     
     # If exists, try with -1, -2, etc.
     counter = 1
     while True:
-        output_file = os.path.join(directory, f"{basename}.{language}-{counter}.srt")
-        if not os.path.exists(output_file):
+        filename = f"{basename}.{language}-{counter}.srt"
+        output_file = os.path.join(directory, filename)
+        if filename not in taken:
             return output_file
         counter += 1
         
@@ -0,0 +1,237 @@
+"""
+In-memory index of directory listings, shared by subtitle discovery and naming
+"""
+import os
+import bisect
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Number of directory listings kept in memory
+MAX_INDEXED_DIRECTORIES = 64
+
+
+class DirectoryIndex:
+    """
+    Sorted listing of one directory, searchable by filename prefix.
+    
+    The listing is read once with os.scandir. Changes made by this tool are
+    recorded with add()/remove(); any other change bumps the directory's
+    mtime, which makes get_directory_index() rebuild the listing. Our own
+    changes bump it too, so their new mtime is only accepted inside
+    tracking_changes(), after checking that nothing else changed before.
+    """
+    
+    def __init__(self, directory, names=None, mtime_ns=None):
+        """
+        Args:
+            directory: Directory to index
+            names: Optional listing already read by the caller (every entry
+                name); the directory is then not scanned again
+            mtime_ns: The directory's mtime, taken before reading names
+        """
+        self.directory = directory
+        self.lock = threading.Lock()
+        self._names = []
+        self._mtime_ns = None
+        self._tracking = 0  # Open tracking_changes() blocks that found the listing current
+        if names is None:
+            self.rebuild()
+        else:
+            self._names = sorted(names)
+            self._mtime_ns = mtime_ns
+    
+    def rebuild(self):
+        """Re-read the directory listing."""
+        # Stat first: a change during the scan then shows up as stale
+        mtime_ns = os.stat(self.directory).st_mtime_ns
+        with os.scandir(self.directory) as entries:
+            names = sorted(entry.name for entry in entries)
+        
+        with self.lock:
+            self._names = names
+            self._mtime_ns = mtime_ns
+    
+    def is_stale(self):
+        """Check if the directory changed behind our back."""
+        try:
+            return os.stat(self.directory).st_mtime_ns != self._mtime_ns
+        except OSError:
+            return True
+    
+    def with_prefix(self, prefix):
+        """
+        Get the filenames starting with prefix.
+        
+        Returns:
+            list: Matching filenames, sorted
+        """
+        with self.lock:
+            start = bisect.bisect_left(self._names, prefix)
+            matches = []
+            for name in self._names[start:]:
+                if not name.startswith(prefix):
+                    break
+                matches.append(name)
+            return matches
+    
+    def contains(self, filename):
+        """Check if filename exists in the directory."""
+        with self.lock:
+            position = bisect.bisect_left(self._names, filename)
+            return position < len(self._names) and self._names[position] == filename
+    
+    def add(self, filename):
+        """Record a file created by this tool."""
+        with self.lock:
+            position = bisect.bisect_left(self._names, filename)
+            if position == len(self._names) or self._names[position] != filename:
+                self._names.insert(position, filename)
+            self._refresh_mtime()
+    
+    def remove(self, filename):
+        """Record a file removed (or moved away) by this tool."""
+        with self.lock:
+            position = bisect.bisect_left(self._names, filename)
+            if position < len(self._names) and self._names[position] == filename:
+                del self._names[position]
+            self._refresh_mtime()
+    
+    def _refresh_mtime(self):
+        """
+        Accept the directory's new mtime after a change we made ourselves (lock held).
+        
+        Outside tracking_changes() the directory may also have been changed
+        behind our back since the last listing, and accepting the new mtime
+        would hide that: the listing is marked stale instead.
+        """
+        if not self._tracking:
+            self._mtime_ns = None
+            return
+        try:
+            self._mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            self._mtime_ns = None
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_pinned = {}  # directory -> [index, number of pins], kept outside the LRU
+
+
+def get_directory_index(directory):
+    """
+    Get the up-to-date index of a directory.
+    
+    An unchanged directory costs a single stat; a changed one is re-read.
+    
+    Raises:
+        OSError: If the directory cannot be listed
+    """
+    directory = os.path.abspath(directory)
+    
+    with _indexes_lock:
+        index = _lookup(directory)
+    
+    if index is None:
+        index = DirectoryIndex(directory)
+        with _indexes_lock:
+            _indexes[directory] = index
+            while len(_indexes) > MAX_INDEXED_DIRECTORIES:
+                _indexes.popitem(last=False)
+    elif index.is_stale():
+        index.rebuild()
+    
+    return index
+
+
+def _lookup(directory):
+    """Find a loaded index, pinned ones first (lock held)."""
+    pinned = _pinned.get(directory)
+    if pinned is not None:
+        return pinned[0]
+    index = _indexes.get(directory)
+    if index is not None:
+        _indexes.move_to_end(directory)
+    return index
+
+
+def _get_indexed(directory):
+    """Get the index of a directory only if it is already loaded."""
+    with _indexes_lock:
+        return _lookup(os.path.abspath(directory))
+
+
+@contextmanager
+def pinned_indexes(indexes):
+    """
+    Serve the given indexes, whatever their number, for the duration of the block.
+    
+    Pinned indexes are kept outside the MAX_INDEXED_DIRECTORIES most recently
+    used ones, so a library-wide pass lists each directory only once.
+    
+    Args:
+        indexes: DirectoryIndex objects (e.g. built from a walk's listings)
+    """
+    with _indexes_lock:
+        for index in indexes:
+            directory = os.path.abspath(index.directory)
+            pinned = _pinned.setdefault(directory, [index, 0])
+            pinned[1] += 1
+    try:
+        yield
+    finally:
+        with _indexes_lock:
+            for index in indexes:
+                directory = os.path.abspath(index.directory)
+                pinned = _pinned[directory]
+                pinned[1] -= 1
+                if not pinned[1]:
+                    del _pinned[directory]
+
+
+@contextmanager
+def tracking_changes(directory):
+    """
+    Keep a directory's index current through a change made in the block.
+    
+    The directory is stat'ed first: if the index is current, the additions
+    and removals recorded in the block are trusted and the directory's new
+    mtime is accepted. Otherwise (or for changes recorded outside such a
+    block) the index is re-read on its next use. Keep the block to a single
+    change, so outside changes cannot slip in between.
+    """
+    index = _get_indexed(directory or '.')
+    trusted = False
+    if index is not None:
+        with index.lock:
+            trusted = not index.is_stale()
+            if trusted:
+                index._tracking += 1
+    try:
+        yield
+    finally:
+        if trusted:
+            with index.lock:
+                index._tracking -= 1
+
+
+def record_file_added(path):
+    """Keep the index current after this tool created a file."""
+    index = _get_indexed(os.path.dirname(path))
+    if index is not None:
+        index.add(os.path.basename(path))
+
+
+def record_file_removed(path):
+    """Keep the index current after this tool removed a file."""
+    index = _get_indexed(os.path.dirname(path))
+    if index is not None:
+        index.remove(os.path.basename(path))
+
+
+def record_file_moved(old_path, new_path):
+    """Keep the indexes current after this tool moved a file."""
+    record_file_removed(old_path)
+    record_file_added(new_path)
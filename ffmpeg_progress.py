@@ -0,0 +1,223 @@
+"""
+Running ffmpeg with live progress reporting
+"""
+import subprocess
+import threading
+import time
+from collections import deque
+
+from media_handler import format_file_size
+
+
+# Number of stderr lines kept for error reporting
+STDERR_TAIL_LINES = 40
+
+
+class ConversionCancelled(Exception):
+    """Raised when a running conversion is cancelled by the caller."""
+
+
+def iter_ffmpeg_progress(cmd, duration=None, cancel_event=None, pass_fds=()):
+    """
+    Run an ffmpeg command and yield progress updates as they are produced.
+    
+    ffmpeg is started with '-progress pipe:1' and its key=value blocks are
+    parsed as a stream. Only the last few stderr lines are kept, so memory
+    use is bounded regardless of how long the file is.
+    
+    Args:
+        cmd: ffmpeg argument list (starting with 'ffmpeg')
+        duration: Optional source duration in seconds, used for fraction and ETA
+        cancel_event: Optional threading.Event; when set, ffmpeg is stopped
+            and ConversionCancelled is raised
+        pass_fds: File descriptors ffmpeg may write to ('pipe:N' outputs)
+    
+    Yields:
+        dict: Progress with 'out_time', 'duration', 'fraction', 'speed',
+            'bytes_written', 'eta' and 'done' keys (values may be None)
+    
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits with an error
+            (stderr holds the tail of ffmpeg's log)
+        ConversionCancelled: If cancel_event was set
+    """
+    cmd = [cmd[0], '-nostats', '-progress', 'pipe:1'] + list(cmd[1:])
+    
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace',
+        pass_fds=tuple(pass_fds)
+    )
+    
+    # Drain stderr in the background into a bounded buffer
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr_thread = threading.Thread(
+        target=_drain_lines, args=(process.stderr, stderr_tail), daemon=True
+    )
+    stderr_thread.start()
+    
+    # Stop ffmpeg from a watcher thread, since reading stdout blocks
+    stop_watching = threading.Event()
+    if cancel_event is not None:
+        watcher = threading.Thread(
+            target=_watch_cancel, args=(process, cancel_event, stop_watching), daemon=True
+        )
+        watcher.start()
+    
+    started = time.monotonic()
+    block = {}
+    try:
+        for line in process.stdout:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            block[key] = value
+            if key == 'progress':
+                yield _parse_progress_block(block, duration, started)
+                block = {}
+        process.wait()
+    finally:
+        stop_watching.set()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join()
+    
+    if cancel_event is not None and cancel_event.is_set():
+        raise ConversionCancelled("Conversion cancelled")
+    
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd, stderr=''.join(stderr_tail)
+        )
+
+
+def run_ffmpeg(cmd, duration=None, progress_callback=None, cancel_event=None, pass_fds=()):
+    """
+    Run an ffmpeg command to completion, reporting progress through a callback.
+    
+    Args:
+        cmd: ffmpeg argument list
+        duration: Optional source duration in seconds
+        progress_callback: Optional callable receiving each progress dict
+        cancel_event: Optional threading.Event to stop ffmpeg early
+        pass_fds: File descriptors ffmpeg may write to ('pipe:N' outputs)
+    
+    Returns:
+        dict: The last progress update, or None if ffmpeg reported none
+    """
+    last_progress = None
+    for progress in iter_ffmpeg_progress(cmd, duration, cancel_event, pass_fds):
+        last_progress = progress
+        if progress_callback is not None:
+            progress_callback(progress)
+    return last_progress
+
+
+def describe_progress(progress):
+    """
+    Format a progress dict as a short human-readable string.
+    
+    Args:
+        progress: Progress dict from iter_ffmpeg_progress
+    
+    Returns:
+        str: e.g. "42% at 1.8x, 1.2 GB written, ETA 3:12"
+    """
+    parts = []
+    
+    if progress.get('fraction') is not None:
+        parts.append(f"{progress['fraction'] * 100:.0f}%")
+    elif progress.get('out_time') is not None:
+        parts.append(format_duration(progress['out_time']))
+    
+    if progress.get('speed'):
+        parts.append(f"at {progress['speed']:.1f}x")
+    
+    text = ' '.join(parts)
+    
+    if progress.get('bytes_written'):
+        text += f", {format_file_size(progress['bytes_written'])} written"
+    
+    if progress.get('eta') is not None:
+        text += f", ETA {format_duration(progress['eta'])}"
+    
+    return text.lstrip(', ')
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS or M:SS."""
+    seconds = int(max(0, seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def _parse_progress_block(block, duration, started):
+    """Convert one ffmpeg '-progress' key=value block into a progress dict."""
+    out_time = None
+    # out_time_ms is actually in microseconds, like out_time_us
+    for key in ('out_time_us', 'out_time_ms'):
+        value = block.get(key, '')
+        if value.lstrip('-').isdigit():
+            out_time = max(0, int(value)) / 1_000_000
+            break
+    
+    speed = None
+    speed_text = block.get('speed', '').rstrip('x').strip()
+    try:
+        speed = float(speed_text)
+    except ValueError:
+        pass
+    
+    bytes_written = None
+    size_text = block.get('total_size', '')
+    if size_text.isdigit():
+        bytes_written = int(size_text)
+    
+    done = block.get('progress') == 'end'
+    
+    fraction = None
+    eta = None
+    if duration and out_time is not None:
+        fraction = 1.0 if done else min(out_time / duration, 1.0)
+        remaining = max(duration - out_time, 0.0)
+        if done:
+            eta = 0.0
+        elif speed:
+            eta = remaining / speed
+        elif out_time > 0:
+            # Fall back to the observed media-time rate
+            eta = remaining * (time.monotonic() - started) / out_time
+    
+    return {
+        'out_time': out_time,
+        'duration': duration,
+        'fraction': fraction,
+        'speed': speed,
+        'bytes_written': bytes_written,
+        'eta': eta,
+        'done': done
+    }
+
+
+def _drain_lines(stream, buffer):
+    """Read a text stream line by line into a bounded deque."""
+    for line in stream:
+        buffer.append(line)
+
+
+def _watch_cancel(process, cancel_event, stop_watching):
+    """Terminate the process once cancel_event is set."""
+    while not stop_watching.is_set():
+        if cancel_event.wait(0.5):
+            if process.poll() is None:
+                print("Cancelling ffmpeg...")
+                process.terminate()
+            return
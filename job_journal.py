@@ -0,0 +1,171 @@
+"""
+Crash-safe file writes and an on-disk journal of per-file job stages
+"""
+import os
+import json
+import errno
+import hashlib
+
+from probe_cache import get_cache_dir, file_identity
+
+
+# Suffix of files being written; renamed to their final name once complete
+TEMP_SUFFIX = '.part'
+
+# Job stages, in order
+STAGE_PROBE = 'probe'
+STAGE_REMUX = 'remux'
+STAGE_EXTRACT = 'extract'
+STAGE_VERIFY = 'verify'
+STAGE_RELEASE = 'release'  # MKV moved to the trash (or deleted)
+STAGE_NORMALIZE = 'normalize'  # Subtitles rewritten as UTF-8 SRT
+STAGE_RENAME = 'rename'
+STAGE_DEDUP = 'dedup'
+
+
+def get_temp_path(path):
+    """Get the name a file is written under before being renamed into place."""
+    return path + TEMP_SUFFIX
+
+
+def write_file_atomically(path, data):
+    """
+    Write bytes to a file so that readers see either nothing or all of it.
+    
+    The data goes to a temporary file in the same directory, which is then
+    renamed over the destination.
+    
+    Raises:
+        OSError: If writing fails (the temporary file is removed)
+    """
+    temp_path = get_temp_path(path)
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_new_file_atomically(path, data):
+    """
+    Write a new file like write_file_atomically, but never replace one.
+    
+    The temporary file is hard-linked to the final name, which fails if
+    the name is taken. Filesystems without hard links (FAT, exFAT) get an
+    existence check right before the rename instead.
+    
+    Raises:
+        FileExistsError: If path already exists
+        OSError: If writing fails (the temporary file is removed)
+    """
+    temp_path = get_temp_path(path)
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(temp_path, path)
+        except FileExistsError:
+            raise
+        except OSError:
+            if os.path.lexists(path):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), path)
+            os.replace(temp_path, path)
+    finally:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+
+
+def get_journal_dir():
+    """Return the directory holding job journals."""
+    return os.path.join(get_cache_dir(), 'journal')
+
+
+class JobJournal:
+    """
+    Records the completed stages of one source file's job on disk.
+    
+    After a crash, a new job for the same, unchanged source finds the
+    journal and can skip the stages already done. The journal is bound to
+    the source's identity: if the source changed, it starts empty.
+    """
+    
+    def __init__(self, source_path, journal_dir=None):
+        """
+        Args:
+            source_path: Path of the file being processed (e.g. the MKV)
+            journal_dir: Directory for journal files (defaults to the cache)
+        """
+        self.source_path = os.path.abspath(source_path)
+        journal_dir = journal_dir or get_journal_dir()
+        key = hashlib.sha1(self.source_path.encode('utf-8', errors='surrogateescape')).hexdigest()
+        self.path = os.path.join(journal_dir, f"{key}.json")
+        
+        identity = file_identity(source_path)
+        self._identity = list(identity) if identity is not None else None
+        self._stages = self._load()
+    
+    def _load(self):
+        """Read the journal, ignoring it if it belongs to another version of the source."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable job journal {self.path}: {e}")
+            return {}
+        
+        if data.get('source') != self.source_path or data.get('identity') != self._identity:
+            return {}
+        
+        stages = data.get('stages', {})
+        if stages:
+            print(f"Resuming {os.path.basename(self.source_path)}: {', '.join(stages)} already done")
+        return stages
+    
+    def is_done(self, stage):
+        """Check if a stage was completed."""
+        return stage in self._stages
+    
+    def get(self, stage):
+        """Get the data recorded with a completed stage (or None)."""
+        return self._stages.get(stage)
+    
+    def complete(self, stage, data=None):
+        """
+        Mark a stage as completed and save the journal.
+        
+        Args:
+            stage: One of the STAGE_* constants
+            data: Optional JSON-serializable details needed to resume
+        """
+        self._stages[stage] = data if data is not None else True
+        
+        content = json.dumps({
+            'source': self.source_path,
+            'identity': self._identity,
+            'stages': self._stages
+        }).encode('utf-8')
+        
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_file_atomically(self.path, content)
+        except OSError as e:
+            print(f"Could not save job journal {self.path}: {e}")
+    
+    def discard(self):
+        """Remove the journal once the job is finished."""
+        self._stages = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not remove job journal {self.path}: {e}")
@@ -0,0 +1,115 @@
+"""
+Background job execution for long-running conversion and cleanup work
+"""
+import threading
+
+from gi.repository import GLib
+
+from ffmpeg_progress import ConversionCancelled
+
+
+class BackgroundJob:
+    """
+    Runs a function on a worker thread and reports back on the GTK main loop.
+    
+    The target is called as target(job) on the worker thread. It can call
+    job.report_status() and job.report_progress() at any time, and should check
+    job.cancel_event (or pass it down to the converter) to stop early.
+    All callbacks are delivered on the GTK main loop via GLib.idle_add.
+    """
+    
+    def __init__(self, target, on_status=None, on_progress=None,
+                 on_done=None, on_error=None, on_cancelled=None):
+        """
+        Args:
+            target: Callable run on the worker thread, receives the job
+            on_status: Called with a status string
+            on_progress: Called with a fraction (0.0-1.0) or None to pulse
+            on_done: Called with the target's return value
+            on_error: Called with the exception raised by the target
+            on_cancelled: Called without arguments if the job was cancelled
+        """
+        self.target = target
+        self.on_status = on_status
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancelled = on_cancelled
+        self.cancel_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the job on a daemon worker thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def cancel(self):
+        """Request cancellation of the running job."""
+        print("Cancellation requested")
+        self.cancel_event.set()
+    
+    def is_running(self):
+        """Return True while the worker thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def report_status(self, message):
+        """Send a status message to the main loop."""
+        self._dispatch(self.on_status, message)
+    
+    def report_progress(self, fraction):
+        """Send a progress fraction (or None for indeterminate) to the main loop."""
+        self._dispatch(self.on_progress, fraction)
+    
+    def _run(self):
+        """Worker thread body."""
+        try:
+            result = self.target(self)
+        except ConversionCancelled:
+            self._dispatch(self.on_cancelled)
+        except Exception as e:
+            print(f"Background job failed: {e}")
+            if self.cancel_event.is_set():
+                self._dispatch(self.on_cancelled)
+            else:
+                self._dispatch(self.on_error, e)
+        else:
+            # A late cancel request cannot undo work that already finished
+            self._dispatch(self.on_done, result)
+    
+    def _dispatch(self, callback, *args):
+        """Schedule callback(*args) on the GTK main loop."""
+        if callback is None:
+            return
+        
+        def idle_callback():
+            callback(*args)
+            return False
+        
+        GLib.idle_add(idle_callback)
+
+
+def run_on_main_thread(func, *args):
+    """
+    Run func(*args) on the GTK main loop and wait for its result.
+    
+    Must be called from a worker thread; used for dialogs and widget updates
+    that a background job needs an answer from.
+    """
+    done = threading.Event()
+    outcome = {}
+    
+    def idle_callback():
+        try:
+            outcome['result'] = func(*args)
+        except Exception as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+        return False
+    
+    GLib.idle_add(idle_callback)
+    done.wait()
+    
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
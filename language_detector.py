@@ -0,0 +1,270 @@
+"""
+Fast deterministic English/French language detection for subtitles
+"""
+import math
+import re
+from collections import Counter
+
+from language_tables import (
+    WORD_SCALE, UNSEEN_WORD_FREQUENCY, ENGLISH_WORDS, FRENCH_WORDS,
+    FRENCH_LETTERS, NGRAM_LOG_ODDS
+)
+
+
+# Minimum number of words found in the tables to trust the result
+MIN_KNOWN_WORDS = 3
+
+# Minimum share of words found in the winning language's table; below this
+# the text is probably neither English nor French
+MIN_COVERAGE = 0.35
+
+# Minimum confidence for the built-in classifier to answer
+MIN_CONFIDENCE = 0.9
+
+# Weight of character n-gram evidence for words not in the tables
+NGRAM_WEIGHT = 0.3
+
+WORD_PATTERN = re.compile(r"[a-zàâäçéèêëîïôöûùüÿœæ']+")
+
+
+def _build_word_log_odds():
+    """Precompute log P(word|fr) - log P(word|en) for every known word."""
+    log_odds = {}
+    for word in set(ENGLISH_WORDS) | set(FRENCH_WORDS):
+        english = ENGLISH_WORDS.get(word, UNSEEN_WORD_FREQUENCY) / WORD_SCALE
+        french = FRENCH_WORDS.get(word, UNSEEN_WORD_FREQUENCY) / WORD_SCALE
+        log_odds[word] = math.log(french) - math.log(english)
+    return log_odds
+
+
+WORD_LOG_ODDS = _build_word_log_odds()
+
+
+def classify(text):
+    """
+    Classify text as English or French.
+    
+    Args:
+        text: Subtitle text with timestamps and cue numbers removed
+    
+    Returns:
+        tuple: (language, confidence) where language is 'en', 'fr' or None
+            if the text does not look confidently like either language
+    """
+    text = text.lower().replace('’', "'")
+    words = Counter(WORD_PATTERN.findall(text))
+    if not words:
+        return None, 0.0
+    
+    score = 0.0  # Positive favours French
+    known = {'en': 0, 'fr': 0}
+    
+    for word, count in words.items():
+        word_score, english, french = _word_features(word)
+        score += word_score * count
+        known['en'] += english * count
+        known['fr'] += french * count
+    
+    score += _letter_score(text)
+    
+    language = 'fr' if score > 0 else 'en'
+    coverage = min(known[language] / sum(words.values()), 1.0)
+    confidence = _sigmoid(abs(score))
+    
+    if known[language] < MIN_KNOWN_WORDS or coverage < MIN_COVERAGE or confidence < MIN_CONFIDENCE:
+        return None, confidence
+    
+    return language, confidence
+
+
+def classify_batch(texts):
+    """
+    Classify many texts at once, with the same results as classify().
+    
+    The words of the whole batch share one vocabulary, so each distinct
+    word is scored once (table log-odds, elision split or n-grams). The
+    texts are then scored with NumPy as a sparse text x word count matrix
+    times the per-word scores. Without NumPy, classify() runs per text.
+    
+    Args:
+        texts: Subtitle texts with timestamps and cue numbers removed
+    
+    Returns:
+        list: (language, confidence) tuples, in input order
+    """
+    numpy = _load_numpy()
+    if not numpy:
+        return [classify(text) for text in texts]
+    
+    vocabulary = {}  # word -> column
+    rows, columns, counts = [], [], []
+    letter_scores = []
+    
+    for row, text in enumerate(texts):
+        text = text.lower().replace('’', "'")
+        words = Counter(WORD_PATTERN.findall(text))
+        rows.extend([row] * len(words))
+        columns.extend(vocabulary.setdefault(word, len(vocabulary)) for word in words)
+        counts.extend(words.values())
+        letter_scores.append(_letter_score(text))
+    
+    # Per-word score, English and French table hits (one row per word)
+    features = numpy.array([_word_features(word) for word in vocabulary], dtype=float).reshape(-1, 3)
+    rows = numpy.array(rows, dtype=numpy.intp)
+    counts = numpy.array(counts, dtype=float)
+    weighted = features[numpy.array(columns, dtype=numpy.intp)] * counts[:, None]
+    
+    size = len(texts)
+    totals = numpy.bincount(rows, weights=counts, minlength=size)
+    scores = numpy.bincount(rows, weights=weighted[:, 0], minlength=size) + numpy.array(letter_scores)
+    known_english = numpy.bincount(rows, weights=weighted[:, 1], minlength=size)
+    known_french = numpy.bincount(rows, weights=weighted[:, 2], minlength=size)
+    
+    french = scores > 0
+    known = numpy.where(french, known_french, known_english)
+    coverage = numpy.minimum(known / numpy.maximum(totals, 1), 1.0)
+    magnitude = numpy.minimum(numpy.abs(scores), 40)
+    confidence = numpy.where(magnitude >= 40, 1.0, 1.0 / (1.0 + numpy.exp(-magnitude)))
+    accepted = (known >= MIN_KNOWN_WORDS) & (coverage >= MIN_COVERAGE) & (confidence >= MIN_CONFIDENCE)
+    
+    results = []
+    for total, is_french, is_accepted, text_confidence in zip(
+            totals.tolist(), french.tolist(), accepted.tolist(), confidence.tolist()):
+        if not total:
+            results.append((None, 0.0))
+        elif is_accepted:
+            results.append(('fr' if is_french else 'en', text_confidence))
+        else:
+            results.append((None, text_confidence))
+    return results
+
+
+def _word_features(word):
+    """
+    Score one occurrence of a word.
+    
+    Returns:
+        tuple: (log-odds towards French, English table hits, French table hits)
+    """
+    log_odds = WORD_LOG_ODDS.get(word)
+    if log_odds is not None:
+        return log_odds, int(word in ENGLISH_WORDS), int(word in FRENCH_WORDS)
+    
+    if "'" in word:
+        # Elided French prefix (l', qu') or English contraction ('s, 't)
+        head, _, tail = word.partition("'")
+        score, english, french = 0.0, 0, 0
+        for key in (head + "'", "'" + tail, tail):
+            log_odds = WORD_LOG_ODDS.get(key)
+            if log_odds is not None:
+                score += log_odds
+                english += key in ENGLISH_WORDS
+                french += key in FRENCH_WORDS
+        return score, english, french
+    
+    return NGRAM_WEIGHT * _ngram_log_odds(word), 0, 0
+
+
+def _letter_score(text):
+    """Sum the weights of the French-only letters in lowercased text."""
+    score = 0.0
+    for letter, weight in FRENCH_LETTERS.items():
+        letter_count = text.count(letter)
+        if letter_count:
+            score += weight * letter_count
+    return score
+
+
+def detect_language(text):
+    """
+    Detect the language of subtitle text.
+    
+    Uses the built-in English/French classifier, and falls back to
+    langdetect (if installed) for text that is neither.
+    
+    Args:
+        text: Subtitle text with timestamps and cue numbers removed
+    
+    Returns:
+        tuple: (language, confidence) with a 2-letter code or 'und'
+    """
+    language, confidence = classify(text)
+    if language is not None:
+        return language, confidence
+    
+    return _detect_with_langdetect(text)
+
+
+def detect_languages(texts):
+    """
+    Detect the language of many subtitle texts (see detect_language).
+    
+    Texts the built-in classifier cannot place go to langdetect one by one.
+    
+    Returns:
+        list: (language, confidence) tuples, in input order
+    """
+    results = classify_batch(texts)
+    for position, (language, confidence) in enumerate(results):
+        if language is None:
+            results[position] = _detect_with_langdetect(texts[position])
+    return results
+
+
+def _ngram_log_odds(word):
+    """Sum the character n-gram log-odds of a single word."""
+    total = 0.0
+    for n in (2, 3):
+        for i in range(len(word) - n + 1):
+            total += NGRAM_LOG_ODDS.get(word[i:i + n], 0.0)
+    return total
+
+
+def _sigmoid(x):
+    """Logistic function, safe for large inputs."""
+    if x > 40:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+_numpy = None
+
+
+def _load_numpy():
+    """Import NumPy on first use; returns False if it is not installed."""
+    global _numpy
+    
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    
+    return _numpy
+
+
+_langdetect = None
+
+
+def _detect_with_langdetect(text):
+    """Detect language with langdetect if it is installed."""
+    global _langdetect
+    
+    if _langdetect is None:
+        try:
+            import langdetect
+            langdetect.DetectorFactory.seed = 0  # Make results deterministic
+            _langdetect = langdetect
+        except ImportError:
+            _langdetect = False
+    
+    if not _langdetect:
+        return 'und', 0.0
+    
+    try:
+        best = _langdetect.detect_langs(text)[0]
+        return best.lang, best.prob
+    except _langdetect.LangDetectException as e:
+        print(f"    Language detection failed: {e}")
+        return 'und', 0.0
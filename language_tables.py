@@ -0,0 +1,94 @@
+"""
+Precomputed tables for the built-in English/French language classifier
+
+Word frequencies are approximate occurrences per million words of film and
+TV subtitles. Apostrophe keys are contraction suffixes (English) and elided
+prefixes (French), used for tokens that are not in the tables as a whole.
+"""
+
+
+# Total of the per-million scale used by the word tables
+WORD_SCALE = 1_000_000
+
+# Frequency used for a word known in one language but not the other
+UNSEEN_WORD_FREQUENCY = 2
+
+ENGLISH_WORDS = {
+    'you': 41000, 'i': 39000, 'the': 29000, 'to': 22000, 'a': 20000,
+    'it': 18000, 'and': 13000, 'that': 12000, 'is': 10000, 'of': 10000,
+    'what': 9000, 'in': 9000, 'me': 8000, 'this': 6000, 'my': 6000,
+    'we': 5000, 'know': 5000, 'for': 5000, 'no': 5000, 'have': 5000,
+    'just': 4000, 'not': 4000, 'do': 4000, 'be': 4000, 'on': 4000,
+    'your': 4000, 'was': 4000, 'with': 3500, 'he': 3500, 'so': 3000,
+    'but': 3000, 'all': 3000, 'are': 3000, 'well': 2000, 'oh': 2000,
+    'about': 2000, 'right': 2000, 'get': 2000, 'here': 2000, 'out': 2000,
+    'like': 2000, 'yeah': 2000, 'if': 2000, 'her': 2000, 'she': 2000,
+    'can': 2000, 'up': 2000, 'going': 1500, 'want': 1500, 'think': 1500,
+    'now': 1500, 'go': 1500, 'him': 1500, 'at': 1500, 'how': 1500,
+    'they': 1500, 'got': 1400, 'there': 1400, 'one': 1300, 'did': 1200,
+    'why': 1000, 'see': 1000, 'come': 1000, 'good': 1000, 'his': 1000,
+    'as': 1000, 'would': 1000, 'really': 900, 'when': 900, 'okay': 900,
+    'yes': 900, 'hey': 800, 'look': 800, 'time': 700, 'will': 700,
+    'back': 700, 'tell': 700, 'from': 700, 'were': 700, 'could': 600,
+    'mean': 600, 'been': 600, 'or': 600, 'who': 600, 'had': 600,
+    'something': 500, 'because': 500, 'some': 500, 'then': 500, 'say': 500,
+    'take': 500, 'an': 500, 'way': 500, 'let': 500, 'where': 500,
+    'need': 500, 'man': 500, 'sorry': 400, 'thank': 400, 'please': 400,
+    'never': 400, 'them': 400, 'our': 400, 'us': 400, 'very': 400,
+    'make': 400, 'said': 400, 'should': 300, 'thing': 300,
+    'little': 300, 'these': 300, 'those': 300, 'anything': 300, 'sure': 300,
+    'which': 300, 'only': 300, 'over': 300, 'into': 300, 'people': 300,
+    'doing': 300, 'nothing': 300, 'father': 200, 'mother': 200, 'night': 200,
+    'things': 200, 'everything': 200, 'still': 200, 'maybe': 200, 'down': 200,
+    "'s": 8000, "'t": 6000, "'m": 4000, "'re": 3000, "'ll": 2000,
+    "'ve": 1500, "'d": 1000,
+}
+
+FRENCH_WORDS = {
+    'je': 25000, 'de': 22000, 'est': 15000, 'pas': 15000, 'le': 14000,
+    'vous': 14000, 'la': 13000, 'tu': 13000, 'que': 12000, 'un': 11000,
+    'il': 10000, 'et': 10000, 'à': 10000, 'a': 9000, 'ne': 8000,
+    'les': 8000, 'ce': 7000, 'en': 6000, 'on': 6000, 'ça': 6000,
+    'une': 6000, 'pour': 5500, 'des': 5000, 'moi': 4500, 'qui': 4500,
+    'nous': 4000, 'mais': 4000, 'me': 4000, 'y': 3500, 'dans': 3500,
+    'du': 3000, 'bien': 3000, 'elle': 3000, 'si': 3000, 'tout': 3000,
+    'non': 3000, 'plus': 2800, 'mon': 2500, 'te': 2500, 'suis': 2500,
+    'oui': 2500, 'au': 2400, 'avec': 2300, 'va': 2200, 'se': 2200,
+    'sur': 2000, 'ton': 1800, 'fait': 1800, 'comme': 1800, 'quoi': 1700,
+    'faire': 1600, 'ici': 1500, 'sais': 1500, 'lui': 1500, 'ma': 1500,
+    'ils': 1500, 'toi': 1500, 'veux': 1400, 'là': 1400, 'rien': 1300,
+    'être': 1200, 'es': 1200, 'peut': 1200, 'bon': 1200, 'vais': 1100,
+    'as': 1000, 'dit': 1000, 'ai': 1000, 'son': 1000, 'peux': 1000,
+    'était': 900, 'alors': 900, 'aussi': 900, 'sa': 900, 'où': 900,
+    'merci': 800, 'très': 800, 'quand': 800, 'faut': 800, 'voilà': 700,
+    'tous': 700, 'avez': 700, 'même': 700, 'sont': 700, 'ou': 700,
+    'pourquoi': 700, 'deux': 600, 'vas': 600, 'ont': 600, 'allez': 600,
+    'cette': 600, 'comment': 600, 'vraiment': 600, 'avoir': 600, 'ah': 600,
+    'chose': 500, 'leur': 500, 'maintenant': 500, 'encore': 500, 'aller': 500,
+    'ces': 500, 'jamais': 500, 'mes': 500, 'votre': 500, 'parce': 500,
+    'monsieur': 500, 'hein': 500, 'juste': 500, 'accord': 500, 'besoin': 400,
+    'peu': 400, 'temps': 400, 'après': 400, 'dois': 400, 'merde': 400,
+    'vos': 300, 'enfin': 300, 'personne': 300, 'toujours': 300, 'père': 300,
+    'mère': 300, 'sans': 300, 'avant': 300, 'beaucoup': 300, 'quelque': 300,
+    'hui': 200, 'déjà': 300, 'nuit': 200, 'petit': 200,
+    "c'": 8000, "j'": 6000, "l'": 6000, "d'": 4000, "n'": 4000,
+    "qu'": 4000, "s'": 2000, "m'": 1500, "t'": 1500,
+}
+
+# Letters that almost only occur in French text, with their log-odds weight
+# in favour of French (applied per occurrence)
+FRENCH_LETTERS = {
+    'é': 2.0, 'è': 2.0, 'ê': 2.0, 'à': 1.5, 'ç': 2.5, 'ù': 2.5,
+    'â': 2.0, 'î': 2.0, 'ô': 2.0, 'û': 2.0, 'ë': 1.5, 'ï': 1.5, 'œ': 3.0,
+}
+
+# Character n-gram log-odds (positive favours French, negative English),
+# applied to words that are in neither word table
+NGRAM_LOG_ODDS = {
+    'th': -1.5, 'wh': -1.5, 'sh': -1.0, 'ck': -1.5, 'ow': -1.0,
+    'ee': -1.0, 'oo': -1.0, 'ng': -1.0, 'ea': -0.8, 'wa': -1.2,
+    'ly': -1.2, 'gh': -1.2, 'yo': -0.8, 'ay': -0.8, 'ht': -1.0,
+    'qu': 1.0, 'eu': 1.2, 'ai': 0.6, 'oi': 1.2, 'ux': 1.5,
+    'au': 0.8, 'ou': 0.4, 'ez': 1.5, 'eau': 1.5, 'ie': 0.4,
+    'nt': 0.3, 'es': 0.3, 'll': 0.2, 'ss': 0.3, 'tt': 0.3,
+}
@@ -3,16 +3,29 @@
 Samsung TV Media File Converter
 Main application entry point
 """
+import time
+
+# Taken before anything else is imported, for the time-to-first-frame report
+STARTED = time.perf_counter()
+
 import sys
 import shutil
+import threading
+import subprocess
 import gi
 
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
 from ui_components import MainWindow
 
 
+# Quit once the window is drawn, after printing FIRST_FRAME_MARKER and the
+# seconds elapsed (used by startup_benchmark.py)
+STARTUP_BENCHMARK_FLAG = '--startup-benchmark'
+FIRST_FRAME_MARKER = 'First frame after'
+
+
 def check_dependencies():
     """Check if required external dependencies are installed."""
     missing = []
@@ -26,6 +39,16 @@ def check_dependencies():
     return missing
 
 
+def get_ffmpeg_version():
+    """Return the first line of 'ffmpeg -version', or None if it cannot run."""
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, timeout=10)
+        return result.stdout.splitlines()[0] if result.stdout else None
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Could not get the ffmpeg version: {e}")
+        return None
+
+
 def show_dependency_error(missing_deps):
     """Show error dialog for missing dependencies."""
     dialog = Gtk.MessageDialog(
@@ -47,26 +70,75 @@ def show_dependency_error(missing_deps):
     dialog.destroy()
 
 
+def prewarm():
+    """Load what the first conversion needs (conversion stack, classifier, cache)."""
+    import pipeline
+    import language_detector
+    from probe_cache import get_default_cache
+    
+    get_default_cache()
+
+
+def start_background_checks(on_missing):
+    """
+    Check dependencies, then prewarm, on a worker thread.
+    
+    Args:
+        on_missing: Called on the GTK main loop with the list of missing tools
+    """
+    def worker():
+        missing = check_dependencies()
+        if missing:
+            print(f"ERROR: Missing dependencies: {missing}")
+            GLib.idle_add(on_missing, missing)
+            return
+        
+        version = get_ffmpeg_version()
+        print(f"All dependencies found: ffmpeg, vlc ({version or 'unknown ffmpeg version'})")
+        
+        try:
+            prewarm()
+        except Exception as e:
+            print(f"Prewarming failed: {e}")
+    
+    threading.Thread(target=worker, daemon=True).start()
+
+
 def main():
     """Main application entry point."""
     print("Starting Samsung TV Media File Converter...")
+    benchmark = STARTUP_BENCHMARK_FLAG in sys.argv[1:]
+    exit_code = 0
     
-    # Check dependencies
-    missing = check_dependencies()
-    if missing:
-        print(f"ERROR: Missing dependencies: {missing}")
-        show_dependency_error(missing)
-        sys.exit(1)
+    def on_first_frame(widget, cr):
+        widget.disconnect(first_frame_handler)
+        print(f"{FIRST_FRAME_MARKER} {time.perf_counter() - STARTED:.3f}s", flush=True)
+        if benchmark:
+            GLib.idle_add(Gtk.main_quit)
+        return False
     
-    print("All dependencies found: ffmpeg, vlc")
+    def on_missing(missing):
+        nonlocal exit_code
+        exit_code = 1
+        show_dependency_error(missing)
+        Gtk.main_quit()
+        return False
     
-    # Create and run the application
+    # Create and show the window first: everything else is not needed to draw it
     app = MainWindow()
     app.connect("destroy", Gtk.main_quit)
+    first_frame_handler = app.connect("draw", on_first_frame)
     app.show_all()
     
+    if not benchmark:
+        # Idle callbacks run after the pending redraw, so checks start once the window is up
+        GLib.idle_add(start_background_checks, on_missing)
+    
     print("Application window created. Ready for file input.")
     Gtk.main()
+    
+    if exit_code:
+        sys.exit(exit_code)
 
 
 if __name__ == '__main__':
@@ -2,14 +2,230 @@
 Media file analysis and subtitle handling
 """
 import os
+import re
 import json
+import time
+import threading
 import subprocess
-from langdetect import detect, LangDetectException
+from concurrent.futures import ThreadPoolExecutor
+
+from probe_cache import get_default_cache
+from directory_index import get_directory_index
+from job_journal import STAGE_PROBE
+from metrics import STAGE_DETECT, stage_span
+
+
+# Cache kinds; bump the suffix when the stored format or detector changes
+PROBE_CACHE_KIND = 'ffprobe-v1'
+LANGUAGE_CACHE_KIND = 'language-v3'
+EXTRACTED_CACHE_KIND = 'extracted-v1'
+SUBTITLE_SIZES_CACHE_KIND = 'subtitle-sizes-v1'
+TRACK_LANGUAGES_CACHE_KIND = 'track-languages-v1'
+
+# Language detection reads a few windows spread across a subtitle instead of
+# its start, which is often credits or lyrics: fixed I/O for any length
+LANGUAGE_SAMPLE_WINDOWS = 5
+LANGUAGE_SAMPLE_WINDOW_BYTES = 2048
+
+# Subtitle files read at the same time by batch language detection, and
+# files sampled and classified together (bounds the memory of a batch)
+LANGUAGE_READ_WORKERS = 8
+LANGUAGE_BATCH_SIZE = 1000
+
+# Encoding assumed for subtitles that are not valid UTF-8 (Windows-1252, a
+# superset of the Latin-1 used by older French subtitles)
+SUBTITLE_FALLBACK_ENCODING = 'cp1252'
+
+# Blank line between SRT cues, and inline markup such as <i> or {\an8}
+CUE_BOUNDARY_PATTERN = re.compile(rb'\r?\n[ \t]*\r?\n')
+SUBTITLE_MARKUP_PATTERN = re.compile(r'<[^>\n]*>|\{[^}\n]*\}')
+
+# Untagged embedded text tracks are identified from a few windows of cues,
+# read by ffmpeg with an input seek and a duration limit (not the whole file)
+TRACK_SAMPLE_POSITIONS = (0.25, 0.5, 0.75)
+TRACK_SAMPLE_SECONDS = 90
+TRACK_SAMPLE_TIMEOUT = 60
+
+# Packet-size scans read the whole file: run one at a time, for a limited time
+SIZE_SCAN_SLOTS = threading.BoundedSemaphore(1)
+SIZE_SCAN_TIMEOUT = 300
+
+# Cached instead of the sizes when a scan failed or timed out, so the file
+# is not scanned again on every load (sizes stay unknown)
+SIZE_SCAN_FAILED = 'failed'
+
+# Subtitle codecs ffmpeg can decode and convert to SRT (text-based; ffmpeg
+# only encodes TTML, so such tracks are unsupported)
+TEXT_SUBTITLE_CODECS = {
+    'subrip', 'srt', 'ass', 'ssa', 'webvtt', 'mov_text', 'text', 'microdvd',
+    'subviewer', 'subviewer1', 'jacosub', 'realtext', 'sami', 'stl', 'pjs',
+    'mpl2', 'vplayer', 'eia_608',
+}
+
+# Image-based subtitle codecs (would need OCR to become SRT)
+BITMAP_SUBTITLE_CODECS = {
+    'hdmv_pgs_subtitle', 'dvd_subtitle', 'dvb_subtitle', 'xsub',
+}
+
+# Extraction plan of an embedded subtitle stream
+PLAN_EXTRACT = 'extract'          # Text track, converted to SRT
+PLAN_BITMAP = 'bitmap'            # Image track, cannot become SRT
+PLAN_UNSUPPORTED = 'unsupported'  # Unknown codec, not worth a read of the source
+PLAN_EXTERNAL = 'external'        # Already extracted to an external file
+
+PLAN_LABELS = {
+    PLAN_EXTRACT: 'Extract to SRT',
+    PLAN_BITMAP: 'Skip (bitmap)',
+    PLAN_UNSUPPORTED: 'Skip (unsupported)',
+    PLAN_EXTERNAL: 'Already extracted',
+}
+
+
+def format_file_size(size_bytes):
+    """Format file size in human-readable format."""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.1f} TB"
+
+
+def is_subtitle_for(filename, basename):
+    """Check if filename matches the pattern basename.srt or basename.*.srt."""
+    if not filename.endswith('.srt'):
+        return False
+    
+    file_base = filename[:-len('.srt')]
+    return file_base == basename or file_base.startswith(basename + '.')
+
+
+def find_subtitle_paths(file_path):
+    """
+    Find the external subtitles of a video by prefix in the directory index.
+    
+    Args:
+        file_path: Path of the video file
+    
+    Returns:
+        list: Paths of its basename.srt and basename.*.srt files, sorted
+    
+    Raises:
+        OSError: If the directory cannot be listed
+    """
+    directory = os.path.dirname(file_path)
+    basename = os.path.splitext(os.path.basename(file_path))[0]
+    filenames = get_directory_index(directory or '.').with_prefix(basename)
+    return [os.path.join(directory, filename) for filename in filenames if is_subtitle_for(filename, basename)]
+
+
+def describe_track_size(size_bytes, cues):
+    """Format an embedded track's size and cue count, e.g. '42.1 KB, 812 cues'."""
+    if size_bytes is None:
+        return 'unknown'
+    if cues is None:
+        return format_file_size(size_bytes)
+    return f"{format_file_size(size_bytes)}, {cues} cue{'' if cues == 1 else 's'}"
+
+
+def get_statistics_tag(tags, name):
+    """
+    Read a numeric mkvmerge statistics tag (e.g. NUMBER_OF_BYTES).
+    
+    mkvmerge may write the tag with a language suffix (NUMBER_OF_BYTES-eng).
+    
+    Returns:
+        int: The tag's value, or None if missing or invalid
+    """
+    for key, value in tags.items():
+        if key.upper() == name or key.upper().startswith(name + '-'):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def decode_subtitle_bytes(data):
+    """Decode subtitle bytes as UTF-8, or as SUBTITLE_FALLBACK_ENCODING if they are not."""
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode(SUBTITLE_FALLBACK_ENCODING, errors='replace')
+
+
+def sample_subtitle_text(stream, size):
+    """
+    Read a bounded sample of SRT content spread across its whole length.
+    
+    One window is read from the middle of each of LANGUAGE_SAMPLE_WINDOWS
+    equal slices of the content, so opening credits and closing banners
+    weigh little. Each window is trimmed to whole cues, from its first cue
+    boundary to its last. Content smaller than all the windows together is
+    read whole. Content that is not UTF-8 is decoded as Windows-1252, so
+    the accents of Latin-1 subtitles survive.
+    
+    Args:
+        stream: Binary file object (a file or io.BytesIO)
+        size: Size of the content in bytes
+    
+    Returns:
+        str: SRT text of the sampled cues
+    """
+    if size <= LANGUAGE_SAMPLE_WINDOWS * LANGUAGE_SAMPLE_WINDOW_BYTES:
+        stream.seek(0)
+        return decode_subtitle_bytes(stream.read())
+    
+    samples = []
+    for window in range(LANGUAGE_SAMPLE_WINDOWS):
+        middle = int((window + 0.5) * size / LANGUAGE_SAMPLE_WINDOWS)
+        stream.seek(middle - LANGUAGE_SAMPLE_WINDOW_BYTES // 2)
+        chunk = stream.read(LANGUAGE_SAMPLE_WINDOW_BYTES)
+        
+        boundaries = list(CUE_BOUNDARY_PATTERN.finditer(chunk))
+        if len(boundaries) < 2:
+            # No whole cue in this window
+            continue
+        samples.append(decode_subtitle_bytes(chunk[boundaries[0].end():boundaries[-1].start()]))
+    
+    return '\n\n'.join(samples)
+
+
+def extract_subtitle_text(content):
+    """
+    Keep only the dialogue of SRT content.
+    
+    Cue numbers, timestamp lines, blank lines and markup are removed.
+    
+    Returns:
+        str: The remaining lines joined with spaces
+    """
+    text_lines = []
+    for line in SUBTITLE_MARKUP_PATTERN.sub('', content).split('\n'):
+        line = line.strip()
+        # Skip empty lines, numbers, and timestamp lines
+        if line and not line.isdigit() and '-->' not in line:
+            text_lines.append(line)
+    return ' '.join(text_lines)
 
 
 class MediaHandler:
     """Handles media file analysis and subtitle detection."""
     
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: Optional ProbeCache (defaults to the shared on-disk cache,
+                opened on first use)
+        """
+        self._cache = cache
+    
+    @property
+    def cache(self):
+        """The probe cache, opened on first use (keeps it off the startup path)."""
+        if self._cache is None:
+            self._cache = get_default_cache()
+        return self._cache
+    
     def analyze_file(self, file_path):
         """
         Analyze a media file and return embedded and external subtitles.
@@ -27,27 +243,75 @@ class MediaHandler:
         
         return embedded_subs, external_subs
     
+    def probe(self, file_path):
+        """
+        Run ffprobe on a media file, using the persistent cache when possible.
+        
+        Returns:
+            dict: ffprobe JSON output with 'streams' and 'format' keys
+        
+        Raises:
+            subprocess.CalledProcessError: If ffprobe fails
+            json.JSONDecodeError: If ffprobe output cannot be parsed
+        """
+        data = self.cache.get(file_path, PROBE_CACHE_KIND)
+        if data is not None:
+            return data
+        
+        cmd = [
+            'ffprobe',
+            '-v', 'quiet',
+            '-print_format', 'json',
+            '-show_streams',
+            '-show_format',
+            file_path
+        ]
+        
+        print(f"Running: {' '.join(cmd)}")
+        with stage_span(STAGE_PROBE, file_path) as span:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            span.add_bytes(len(result.stdout))
+        
+        data = json.loads(result.stdout)
+        self.cache.put(file_path, PROBE_CACHE_KIND, data)
+        return data
+    
+    def get_duration(self, file_path):
+        """
+        Get the duration of a media file in seconds using ffprobe.
+        
+        Returns:
+            float: Duration in seconds, or None if unknown
+        """
+        try:
+            data = self.probe(file_path)
+            return float(data['format']['duration'])
+        except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Could not determine duration of {file_path}: {e}")
+            return None
+    
     def _get_embedded_subtitles(self, file_path):
-        """Get embedded subtitles from video file using ffprobe."""
+        """
+        Get embedded subtitles from video file using ffprobe.
+        
+        Each subtitle gets a 'codec' and an extraction 'plan' (one of the
+        PLAN_* constants), so streams that cannot become SRT are never read.
+        """
         subtitles = []
         
         try:
             # Use ffprobe to get subtitle stream information
-            cmd = [
-                'ffprobe',
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_streams',
-                '-select_streams', 's',
-                file_path
-            ]
-            
-            print(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            data = json.loads(result.stdout)
+            data = self.probe(file_path)
+            extracted = self._get_extracted_subtitles(file_path)
+            scanned_sizes = self.cache.get(file_path, SUBTITLE_SIZES_CACHE_KIND)
+            if scanned_sizes == SIZE_SCAN_FAILED:
+                scanned_sizes = None
+            sampled_languages = self.cache.get(file_path, TRACK_LANGUAGES_CACHE_KIND) or {}
             
             for stream in data.get('streams', []):
+                if stream.get('codec_type') != 'subtitle':
+                    continue
+                
                 # Get language from stream tags
                 tags = stream.get('tags', {})
                 language = tags.get('language', 'und')
@@ -57,16 +321,37 @@ class MediaHandler:
                     # Try to convert 3-letter codes to 2-letter
                     language = self._normalize_language_code(language)
                 
-                # Estimate size (not directly available from ffprobe)
-                size = 'embedded'
+                index = stream.get('index', 0)
+                
+                # Untagged track identified from its cues by an earlier sample
+                sampled = language == 'und' and sampled_languages.get(str(index), 'und') != 'und'
+                if sampled:
+                    language = sampled_languages[str(index)]
+                
+                # Size from mkvmerge statistics tags, or from an earlier packet scan
+                size_bytes = get_statistics_tag(tags, 'NUMBER_OF_BYTES')
+                cues = get_statistics_tag(tags, 'NUMBER_OF_FRAMES')
+                if size_bytes is None and scanned_sizes is not None:
+                    size_bytes, cues = scanned_sizes.get(str(index), [0, 0])
+                size = describe_track_size(size_bytes, cues)
+                
+                codec = stream.get('codec_name', 'unknown')
+                plan = self._plan_extraction(codec)
+                if plan == PLAN_EXTRACT and str(index) in extracted:
+                    plan = PLAN_EXTERNAL
                 
                 subtitles.append({
                     'language': language,
                     'size': size,
-                    'index': stream.get('index', 0)
+                    'bytes': size_bytes,
+                    'cues': cues,
+                    'index': index,
+                    'codec': codec,
+                    'plan': plan,
+                    'sampled': sampled
                 })
                 
-                print(f"  Embedded subtitle: {language} (index {stream.get('index')})")
+                print(f"  Embedded subtitle: {language} (index {index}, {codec}: {PLAN_LABELS[plan]})")
         
         except subprocess.CalledProcessError as e:
             print(f"Error running ffprobe: {e}")
@@ -77,78 +362,385 @@ class MediaHandler:
         
         return subtitles
     
+    def scan_subtitle_sizes(self, file_path, cancel_event=None):
+        """
+        Measure every subtitle track of a file from its packet sizes.
+        
+        This reads the whole file (only subtitle packets are reported), so
+        scans run one at a time and give up after SIZE_SCAN_TIMEOUT seconds.
+        Results are cached, and so are failures and timeouts (as
+        SIZE_SCAN_FAILED); cancelled scans are not.
+        
+        Args:
+            file_path: Path of the video file
+            cancel_event: Optional threading.Event to stop the scan
+        
+        Returns:
+            dict: str(stream index) -> [size in bytes, number of cues]
+                (streams without packets are missing), or None if the scan failed, timed out or was cancelled
+        """
+        sizes = self.cache.get(file_path, SUBTITLE_SIZES_CACHE_KIND)
+        if sizes == SIZE_SCAN_FAILED:
+            return None
+        if sizes is not None:
+            return sizes
+        
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 's',
+            '-show_entries', 'packet=stream_index,size',
+            '-of', 'csv=p=0',
+            file_path
+        ]
+        
+        with SIZE_SCAN_SLOTS:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            
+            print(f"Running: {' '.join(cmd)}")
+            with stage_span(STAGE_PROBE, file_path) as span:
+                span.add_file_size(file_path)
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                deadline = time.monotonic() + SIZE_SCAN_TIMEOUT
+                while True:
+                    try:
+                        output, _ = process.communicate(timeout=0.5)
+                        break
+                    except subprocess.TimeoutExpired:
+                        cancelled = cancel_event is not None and cancel_event.is_set()
+                        if cancelled or time.monotonic() > deadline:
+                            print(f"Subtitle size scan stopped: {file_path}")
+                            process.kill()
+                            process.communicate()
+                            if not cancelled:
+                                self.cache.put(file_path, SUBTITLE_SIZES_CACHE_KIND, SIZE_SCAN_FAILED)
+                            return None
+        
+        if process.returncode != 0:
+            print(f"Subtitle size scan failed: {file_path}")
+            self.cache.put(file_path, SUBTITLE_SIZES_CACHE_KIND, SIZE_SCAN_FAILED)
+            return None
+        
+        sizes = {}
+        for line in output.splitlines():
+            try:
+                stream_index, size = line.split(',')[:2]
+                entry = sizes.setdefault(stream_index, [0, 0])
+                entry[0] += int(size)
+                entry[1] += 1
+            except ValueError:
+                continue
+        
+        self.cache.put(file_path, SUBTITLE_SIZES_CACHE_KIND, sizes)
+        return sizes
+    
+    def sample_track_languages(self, file_path, stream_indexes, duration=None, cancel_event=None):
+        """
+        Detect the languages of embedded text tracks from samples of their cues.
+        
+        At each of TRACK_SAMPLE_POSITIONS through the file, one ffmpeg run
+        seeks in the input and converts TRACK_SAMPLE_SECONDS of every track
+        to SRT, each into its own pipe, so a window is read once however
+        many tracks are sampled. Results are cached.
+        
+        Args:
+            file_path: Path of the video file
+            stream_indexes: ffprobe indexes of the subtitle streams
+            duration: Duration of the file in seconds (probed if omitted)
+            cancel_event: Optional threading.Event to stop between windows
+        
+        Returns:
+            dict: stream index -> 2-letter language code, or 'und' (empty
+                if cancelled before any track was known)
+        """
+        languages = self.cache.get(file_path, TRACK_LANGUAGES_CACHE_KIND) or {}
+        found = {index: languages[str(index)] for index in stream_indexes if str(index) in languages}
+        pending = [index for index in stream_indexes if str(index) not in languages]
+        if not pending:
+            return found
+        
+        from converter import SubtitlePipes
+        
+        if duration is None:
+            duration = self.get_duration(file_path)
+        starts = [position * duration for position in TRACK_SAMPLE_POSITIONS] if duration else [0]
+        
+        samples = {index: [] for index in pending}
+        for start in starts:
+            if cancel_event is not None and cancel_event.is_set():
+                return found
+            
+            pipes = SubtitlePipes(pending)
+            cmd = ['ffmpeg', '-v', 'error', '-ss', f"{start:.3f}", '-i', file_path]
+            for target in pipes.targets:
+                cmd += [
+                    '-t', str(TRACK_SAMPLE_SECONDS),
+                    '-map', f"0:{target['index']}",
+                    '-f', 'srt',
+                    target['output']
+                ]
+            
+            print(f"Running: {' '.join(cmd)}")
+            try:
+                with stage_span(STAGE_PROBE, file_path) as span:
+                    try:
+                        subprocess.run(
+                            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            timeout=TRACK_SAMPLE_TIMEOUT, check=True, pass_fds=pipes.write_fds
+                        )
+                    finally:
+                        data = pipes.collect()
+                    span.add_bytes(sum(len(chunk) for chunk in data.values()))
+            except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                print(f"    Could not sample subtitle streams {', '.join(map(str, pending))}: {e}")
+                continue
+            
+            for index, chunk in data.items():
+                samples[index].append(chunk.decode('utf-8', errors='ignore'))
+        
+        detected = {
+            index: self.detect_text_language('\n\n'.join(texts))
+            for index, texts in samples.items() if texts
+        }
+        if not detected:
+            return found
+        
+        # Re-read: other tracks of the file may have been sampled meanwhile
+        languages = self.cache.get(file_path, TRACK_LANGUAGES_CACHE_KIND) or {}
+        languages.update((str(index), language) for index, language in detected.items())
+        self.cache.put(file_path, TRACK_LANGUAGES_CACHE_KIND, languages)
+        
+        found.update(detected)
+        return found
+    
+    def identify_untagged_tracks(self, file_path, embedded_subs, cancel_event=None):
+        """
+        Give the untagged text tracks of a file the language of their cues.
+        
+        Tracks tagged 'und' that are planned for extraction are sampled
+        together with sample_track_languages(); the ones recognized get
+        their 'language' replaced and 'sampled' set, so extraction names
+        them accordingly.
+        
+        Args:
+            file_path: Path of the video file
+            embedded_subs: Embedded subtitle dicts from analyze_file (updated in place)
+            cancel_event: Optional threading.Event to stop between sample windows
+        
+        Returns:
+            list: The subtitle dicts that got a language
+        """
+        untagged = [sub for sub in embedded_subs if sub['language'] == 'und' and sub['plan'] == PLAN_EXTRACT]
+        if not untagged:
+            return []
+        
+        languages = self.sample_track_languages(
+            file_path, [sub['index'] for sub in untagged], cancel_event=cancel_event
+        )
+        
+        identified = []
+        for sub in untagged:
+            language = languages.get(sub['index'], 'und')
+            if language != 'und':
+                print(f"  Untagged subtitle stream {sub['index']} looks like: {language}")
+                sub['language'] = language
+                sub['sampled'] = True
+                identified.append(sub)
+        
+        return identified
+    
+    def _plan_extraction(self, codec):
+        """Decide what to do with an embedded subtitle stream, from its codec."""
+        if codec in TEXT_SUBTITLE_CODECS:
+            return PLAN_EXTRACT
+        if codec in BITMAP_SUBTITLE_CODECS:
+            return PLAN_BITMAP
+        return PLAN_UNSUPPORTED
+    
+    def _get_extracted_subtitles(self, file_path):
+        """
+        Get the streams of a video already extracted to external files.
+        
+        Returns:
+            dict: str(stream index) -> subtitle filename, for files that
+                still exist
+        """
+        extracted = self.cache.get(file_path, EXTRACTED_CACHE_KIND) or {}
+        if not extracted:
+            return {}
+        
+        try:
+            index = get_directory_index(os.path.dirname(file_path) or '.')
+        except OSError:
+            return {}
+        
+        return {
+            stream_index: filename
+            for stream_index, filename in extracted.items()
+            if index.contains(filename)
+        }
+    
+    def record_extracted_subtitles(self, file_path, extracted):
+        """
+        Remember which streams of a video now exist as external files.
+        
+        Args:
+            file_path: Path of the video file
+            extracted: dict of stream index -> subtitle filename
+        """
+        if not extracted:
+            return
+        
+        known = self.cache.get(file_path, EXTRACTED_CACHE_KIND) or {}
+        known.update({str(stream_index): filename for stream_index, filename in extracted.items()})
+        self.cache.put(file_path, EXTRACTED_CACHE_KIND, known)
+    
     def _get_external_subtitles(self, file_path):
-        """Get external .srt subtitle files in the same directory."""
-        subtitles = []
+        """
+        Get external .srt subtitle files in the same directory.
         
-        directory = os.path.dirname(file_path)
-        basename = os.path.splitext(os.path.basename(file_path))[0]
+        Args:
+            file_path: Path of the video file
+        """
+        subtitles = []
         
         try:
             # Find all .srt files that match the base name
-            for filename in os.listdir(directory):
-                if not filename.endswith('.srt'):
-                    continue
-                
-                # Check if it matches the pattern: basename.*.srt or basename.srt
-                file_base = filename.replace('.srt', '')
-                
-                if file_base == basename or file_base.startswith(basename + '.'):
-                    full_path = os.path.join(directory, filename)
-                    
-                    # Detect language from content
-                    language = self._detect_subtitle_language(full_path)
-                    
-                    # Get file size
-                    size = self._format_file_size(os.path.getsize(full_path))
-                    
-                    subtitles.append({
-                        'language': language,
-                        'size': size,
-                        'filename': filename,
-                        'path': full_path
-                    })
-                    
-                    print(f"  External subtitle: {filename} - {language} ({size})")
+            for full_path in find_subtitle_paths(file_path):
+                subtitles.append(self.describe_external_subtitle(full_path))
         
         except Exception as e:
             print(f"Error scanning for external subtitles: {e}")
         
         return subtitles
     
+    def describe_external_subtitle(self, srt_path):
+        """
+        Describe a single external subtitle file.
+        
+        Returns:
+            dict: 'language', 'size', 'filename' and 'path' keys
+        """
+        filename = os.path.basename(srt_path)
+        
+        # Detect language from content
+        language = self._detect_subtitle_language(srt_path)
+        
+        # Get file size
+        size = self._format_file_size(os.path.getsize(srt_path))
+        
+        print(f"  External subtitle: {filename} - {language} ({size})")
+        
+        return {
+            'language': language,
+            'size': size,
+            'filename': filename,
+            'path': srt_path
+        }
+    
     def _detect_subtitle_language(self, srt_path):
-        """Detect language of an SRT file using langdetect."""
+        """Detect language of an SRT file, using the persistent cache when possible."""
+        language = self.cache.get(srt_path, LANGUAGE_CACHE_KIND)
+        if language is not None:
+            print(f"    Cached language: {language}")
+            return language
+        
+        language = self._detect_subtitle_language_uncached(srt_path)
+        self.cache.put(srt_path, LANGUAGE_CACHE_KIND, language)
+        return language
+    
+    def _detect_subtitle_language_uncached(self, srt_path):
+        """Detect language of an SRT file using the built-in classifier."""
         try:
-            with open(srt_path, 'r', encoding='utf-8', errors='ignore') as f:
-                # Read a sample of the file (first 5000 chars should be enough)
-                content = f.read(5000)
-                
-                # Remove subtitle timestamps and numbers
-                lines = content.split('\n')
-                text_lines = []
-                for line in lines:
-                    line = line.strip()
-                    # Skip empty lines, numbers, and timestamp lines
-                    if line and not line.isdigit() and '-->' not in line:
-                        text_lines.append(line)
-                
-                text = ' '.join(text_lines)
-                
-                if text:
-                    detected = detect(text)
-                    print(f"    Detected language: {detected}")
-                    return detected
-                else:
-                    print(f"    No text found in subtitle")
-                    return 'und'
-        
-        except LangDetectException as e:
-            print(f"    Language detection failed: {e}")
-            return 'und'
+            with open(srt_path, 'rb') as f:
+                content = sample_subtitle_text(f, os.fstat(f.fileno()).st_size)
+            return self.detect_text_language(content)
+        
         except Exception as e:
             print(f"    Error reading subtitle file: {e}")
             return 'und'
     
+    def detect_text_language(self, content):
+        """
+        Detect the language of SRT content already in memory.
+        
+        Args:
+            content: SRT text (a sample from sample_subtitle_text is enough)
+        
+        Returns:
+            str: 2-letter language code, or 'und'
+        """
+        text = extract_subtitle_text(content)
+        
+        if text:
+            # Imported on first use: building the classifier tables slows startup
+            from language_detector import detect_language
+            
+            with stage_span(STAGE_DETECT) as span:
+                span.add_bytes(len(text))
+                detected, confidence = detect_language(text)
+            print(f"    Detected language: {detected} (confidence {confidence:.2f})")
+            return detected
+        else:
+            print(f"    No text found in subtitle")
+            return 'und'
+    
+    def detect_subtitle_languages(self, srt_paths, workers=LANGUAGE_READ_WORKERS):
+        """
+        Detect the languages of many SRT files in one batch.
+        
+        Cached results are looked up together. The other files are handled
+        in chunks of LANGUAGE_BATCH_SIZE, so memory stays bounded for any
+        library: each chunk is sampled (see sample_subtitle_text) by several
+        threads at once, classified with one
+        language_detector.detect_languages() call, and stored in the cache
+        together.
+        
+        Args:
+            srt_paths: Paths of the subtitle files
+            workers: Number of files read at the same time
+        
+        Returns:
+            dict: path -> 2-letter language code or 'und'
+        """
+        languages = self.cache.get_many(srt_paths, LANGUAGE_CACHE_KIND)
+        pending = [path for path in dict.fromkeys(srt_paths) if path not in languages]
+        if not pending:
+            return languages
+        
+        from language_detector import detect_languages
+        
+        cached = len(languages)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(pending), LANGUAGE_BATCH_SIZE):
+                chunk = pending[start:start + LANGUAGE_BATCH_SIZE]
+                texts = list(executor.map(self._read_subtitle_text, chunk))
+                
+                # Files without any text are 'und' without asking the classifier
+                with_text = [(path, text) for path, text in zip(chunk, texts) if text]
+                detected = {path: 'und' for path, text in zip(chunk, texts) if not text}
+                with stage_span(STAGE_DETECT) as span:
+                    span.add_bytes(sum(len(text) for _, text in with_text))
+                    results = detect_languages([text for _, text in with_text])
+                for (path, _), (language, _) in zip(with_text, results):
+                    detected[path] = language
+                
+                self.cache.put_many(detected, LANGUAGE_CACHE_KIND)
+                languages.update(detected)
+        
+        print(f"Detected languages of {len(pending)} subtitle(s) ({cached} cached)")
+        return languages
+    
+    def _read_subtitle_text(self, srt_path):
+        """Read the dialogue of a sample of an SRT file ('' if it cannot be read)."""
+        try:
+            with open(srt_path, 'rb') as f:
+                return extract_subtitle_text(sample_subtitle_text(f, os.fstat(f.fileno()).st_size))
+        except OSError as e:
+            print(f"    Error reading subtitle file {srt_path}: {e}")
+            return ''
+    
     def _normalize_language_code(self, code):
         """Normalize 3-letter language codes to 2-letter ISO codes."""
         # Common 3-letter to 2-letter mappings
@@ -174,8 +766,4 @@ class MediaHandler:
     
     def _format_file_size(self, size_bytes):
         """Format file size in human-readable format."""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size_bytes < 1024.0:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024.0
-        return f"{size_bytes:.1f} TB"
+        return format_file_size(size_bytes)
@@ -0,0 +1,211 @@
+"""
+Per-stage timing spans, exported as JSON lines and a Prometheus textfile
+"""
+import os
+import json
+import time
+import atexit
+import resource
+import threading
+
+from job_journal import write_file_atomically
+
+
+# Timed stages besides the job stages of job_journal (spans may nest:
+# 'hash' runs inside 'dedup', 'detect' inside 'extract' or 'rename')
+STAGE_DETECT = 'detect'
+STAGE_HASH = 'hash'
+STAGE_TRASH = 'trash'
+
+# Prefix of the exported Prometheus metric names
+METRIC_PREFIX = 'fixmovies_stage'
+
+# Minimum seconds between two rewrites of the Prometheus textfile
+TEXTFILE_WRITE_INTERVAL = 10
+
+
+class _NullSpan:
+    """Span handed out when metrics are disabled: does nothing."""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+    
+    def add_bytes(self, size):
+        pass
+    
+    def add_file_size(self, path):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Measures one run of a stage and hands it to the recorder on exit."""
+    
+    def __init__(self, recorder, stage, path):
+        self.recorder = recorder
+        self.stage = stage
+        self.path = path
+        self.size = 0
+    
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._child_cpu = _get_child_cpu_time()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.recorder.record({
+            'time': time.time(),
+            'stage': self.stage,
+            'path': self.path,
+            'bytes': self.size,
+            'wall': time.perf_counter() - self._wall,
+            'cpu': time.thread_time() - self._cpu,
+            'child_cpu': _get_child_cpu_time() - self._child_cpu,
+            'ok': exc_type is None,
+        })
+        return False
+    
+    def add_bytes(self, size):
+        """Count bytes processed by the stage."""
+        self.size += size
+    
+    def add_file_size(self, path):
+        """Count a whole file as processed by the stage."""
+        try:
+            self.size += os.path.getsize(path)
+        except OSError:
+            pass
+
+
+def _get_child_cpu_time():
+    """CPU seconds used by finished child processes (ffmpeg, ffprobe)."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class MetricsRecorder:
+    """
+    Collects finished spans: appends each one to a JSON lines log and keeps
+    per-stage totals for a Prometheus textfile-collector file.
+    """
+    
+    def __init__(self, log_path=None, textfile_path=None):
+        """
+        Args:
+            log_path: Optional JSON lines file receiving one line per span
+            textfile_path: Optional .prom file for node_exporter's textfile
+                collector, rewritten at most every TEXTFILE_WRITE_INTERVAL
+                seconds and on flush()
+        """
+        self.log_path = log_path
+        self.textfile_path = textfile_path
+        self.lock = threading.Lock()
+        self._totals = {}  # stage -> dict of counters
+        self._last_write = 0
+        self._log = open(log_path, 'a', encoding='utf-8') if log_path else None
+    
+    def record(self, entry):
+        """Add a finished span."""
+        with self.lock:
+            totals = self._totals.setdefault(entry['stage'], {
+                'runs': 0, 'errors': 0, 'bytes': 0, 'wall': 0.0, 'cpu': 0.0, 'child_cpu': 0.0
+            })
+            totals['runs'] += 1
+            totals['errors'] += 0 if entry['ok'] else 1
+            for key in ('bytes', 'wall', 'cpu', 'child_cpu'):
+                totals[key] += entry[key]
+            
+            if self._log is not None:
+                self._log.write(json.dumps(entry) + '\n')
+                self._log.flush()
+            
+            if self.textfile_path and time.monotonic() - self._last_write >= TEXTFILE_WRITE_INTERVAL:
+                self._write_textfile()
+    
+    def flush(self):
+        """Write the Prometheus textfile now."""
+        with self.lock:
+            if self.textfile_path:
+                self._write_textfile()
+    
+    def close(self):
+        """Flush and close the log."""
+        self.flush()
+        with self.lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+    
+    def _write_textfile(self):
+        """Rewrite the textfile from the totals (called with the lock held)."""
+        counters = [
+            ('runs_total', 'runs', "Runs of a stage"),
+            ('errors_total', 'errors', "Runs of a stage that raised an error"),
+            ('bytes_total', 'bytes', "Bytes processed by a stage"),
+            ('seconds_total', 'wall', "Wall-clock seconds spent in a stage"),
+            ('cpu_seconds_total', 'cpu', "CPU seconds used by this process in a stage"),
+            ('child_cpu_seconds_total', 'child_cpu',
+             "CPU seconds used by child processes (ffmpeg, ffprobe) finished during a stage"),
+        ]
+        
+        lines = []
+        for suffix, key, description in counters:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for stage in sorted(self._totals):
+                lines.append(f'{name}{{stage="{stage}"}} {self._totals[stage][key]}')
+        
+        try:
+            write_file_atomically(self.textfile_path, ('\n'.join(lines) + '\n').encode('utf-8'))
+            self._last_write = time.monotonic()
+        except OSError as e:
+            print(f"Could not write metrics to {self.textfile_path}: {e}")
+
+
+_recorder = None
+
+
+def configure_metrics(log_path=None, textfile_path=None):
+    """
+    Enable metrics (or disable them when both paths are None).
+    
+    Args:
+        log_path: JSON lines file receiving one line per span
+        textfile_path: Prometheus textfile-collector file (name it *.prom)
+    """
+    global _recorder
+    if _recorder is not None:
+        atexit.unregister(_recorder.close)
+        _recorder.close()
+        _recorder = None
+    
+    if log_path or textfile_path:
+        _recorder = MetricsRecorder(log_path, textfile_path)
+        atexit.register(_recorder.close)
+
+
+def stage_span(stage, path=None):
+    """
+    Time one run of a stage.
+    
+    Use as a context manager; the span records wall-clock time, this
+    thread's CPU time, child process CPU time and the bytes passed to
+    add_bytes()/add_file_size(). Child CPU time is process-wide, so it is
+    only exact when one job runs at a time. When metrics are disabled a
+    shared no-op span is returned, so instrumented code costs one check.
+    
+    Args:
+        stage: One of the STAGE_* constants (here or in job_journal)
+        path: Optional file the stage works on
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, stage, path)
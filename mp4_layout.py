@@ -0,0 +1,212 @@
+"""
+MP4 layout: moov placement, startup read size and moov size estimation
+"""
+import os
+import struct
+
+from media_handler import format_file_size
+
+
+# Faststart modes for MP4 output
+FASTSTART_RESERVE = 'reserve'    # Reserve moov space at the front (single write)
+FASTSTART_RELOCATE = 'relocate'  # ffmpeg's +faststart (moves moov in a second pass)
+
+# Upper bounds of moov bytes per sample (stsz, ctts, stts and chunk offsets)
+MOOV_BYTES_PER_VIDEO_SAMPLE = 20
+MOOV_BYTES_PER_AUDIO_SAMPLE = 12
+MOOV_RESERVE_MARGIN = 1.1
+MOOV_RESERVE_EXTRA = 64 * 1024
+
+# Samples per frame of common audio codecs (AAC and anything unknown: 1024)
+AUDIO_FRAME_SIZES = {
+    'ac3': 1536,
+    'eac3': 1536,
+    'dts': 512,
+    'mp3': 1152,
+    'mp2': 1152,
+    'opus': 960,
+    'flac': 4096,
+    'truehd': 40,
+}
+
+# ffmpeg's error when the reserved moov space was not enough
+MOOV_TOO_SMALL_MESSAGE = 'reserved_moov_size is too small'
+
+
+def read_top_level_atoms(mp4_path):
+    """
+    List the top-level atoms (boxes) of an MP4 file.
+    
+    Only the 8 or 16 byte atom headers are read.
+    
+    Returns:
+        list: (type, offset, size) tuples in file order
+    """
+    atoms = []
+    file_size = os.path.getsize(mp4_path)
+    
+    with open(mp4_path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, atom_type = struct.unpack('>I4s', f.read(8))
+            if size == 1:
+                # 64-bit size follows the type
+                size = struct.unpack('>Q', f.read(8))[0]
+            elif size == 0:
+                # Atom extends to the end of the file
+                size = file_size - offset
+            
+            if size < 8:
+                break
+            
+            atoms.append((atom_type.decode('latin-1'), offset, size))
+            offset += size
+    
+    return atoms
+
+
+def describe_startup_read(mp4_path):
+    """
+    Measure what a player must read before it can start playback.
+    
+    A player needs the moov atom. With moov at the front it is read in one
+    go from the start of the file; with moov at the end the player reads
+    the atom headers up to the media data, then seeks past all of it.
+    
+    Returns:
+        dict: 'front_loaded' (bool), 'startup_bytes' (bytes read before
+            playback), 'seek_bytes' (bytes skipped by the seek to moov),
+            'moov_size', 'media_bytes' (size of the media data) and
+            'header_bytes' (other headers before the media data, such as
+            ftyp); or None if the file has no moov or mdat atom
+    """
+    atoms = read_top_level_atoms(mp4_path)
+    moov = next((atom for atom in atoms if atom[0] == 'moov'), None)
+    mdat = next((atom for atom in atoms if atom[0] == 'mdat'), None)
+    if moov is None or mdat is None:
+        return None
+    
+    _, moov_offset, moov_size = moov
+    _, mdat_offset, media_bytes = mdat
+    header_bytes = sum(size for atom_type, offset, size in atoms
+                       if offset < mdat_offset and atom_type not in ('moov', 'free', 'skip', 'wide'))
+    
+    if moov_offset < mdat_offset:
+        return {
+            'front_loaded': True,
+            'startup_bytes': moov_offset + moov_size,
+            'seek_bytes': 0,
+            'moov_size': moov_size,
+            'media_bytes': media_bytes,
+            'header_bytes': header_bytes,
+        }
+    
+    return {
+        'front_loaded': False,
+        'startup_bytes': mdat_offset + 16 + moov_size,
+        'seek_bytes': moov_offset - mdat_offset,
+        'moov_size': moov_size,
+        'media_bytes': media_bytes,
+        'header_bytes': header_bytes,
+    }
+
+
+def moov_at_end_equivalent(startup_read):
+    """
+    Get the startup read of the same file written with moov at the end.
+    
+    Args:
+        startup_read: dict from describe_startup_read
+    
+    Returns:
+        dict: Same keys as describe_startup_read
+    """
+    return dict(
+        startup_read,
+        front_loaded=False,
+        startup_bytes=startup_read['header_bytes'] + 16 + startup_read['moov_size'],
+        seek_bytes=startup_read['media_bytes'],
+    )
+
+
+def format_startup_read(startup_read):
+    """Format a startup read, e.g. '1.2 MB from the start' or '1.2 MB after a 4.0 GB seek'."""
+    size = format_file_size(startup_read['startup_bytes'])
+    if startup_read['front_loaded']:
+        return f"{size} from the start"
+    return f"{size} after a {format_file_size(startup_read['seek_bytes'])} seek"
+
+
+def estimate_moov_size(probe_data, codec_overrides=None):
+    """
+    Estimate an upper bound of the moov size of a remux of the probed file.
+    
+    The moov mostly holds per-sample tables, so the estimate counts the
+    video frames and audio frames of the streams copied to the MP4.
+    
+    Args:
+        probe_data: ffprobe JSON output with 'streams' and 'format' keys
+        codec_overrides: Optional dict of stream index -> output codec, for
+            audio streams that are transcoded
+    
+    Returns:
+        int: Bytes to reserve, or None if the duration is unknown
+    """
+    try:
+        duration = float(probe_data['format']['duration'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    
+    codec_overrides = codec_overrides or {}
+    total = 0
+    for stream in probe_data.get('streams', []):
+        codec_type = stream.get('codec_type')
+        if codec_type == 'video':
+            fps = _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate')) or 30
+            total += duration * fps * MOOV_BYTES_PER_VIDEO_SAMPLE
+        elif codec_type == 'audio':
+            sample_rate = _parse_rate(stream.get('sample_rate')) or 48000
+            codec = codec_overrides.get(stream.get('index'), stream.get('codec_name'))
+            frame_size = AUDIO_FRAME_SIZES.get(codec, 1024)
+            total += duration * sample_rate / frame_size * MOOV_BYTES_PER_AUDIO_SAMPLE
+    
+    return int(total * MOOV_RESERVE_MARGIN) + MOOV_RESERVE_EXTRA
+
+
+def get_faststart_options(mode, probe_data=None, codec_overrides=None):
+    """
+    Get the ffmpeg output options for a faststart mode.
+    
+    The reserve mode falls back to relocation when the moov size cannot
+    be estimated.
+    
+    Args:
+        mode: One of the FASTSTART_* constants
+        probe_data: ffprobe JSON output of the source (for the reserve mode)
+        codec_overrides: Optional dict of stream index -> output codec
+    
+    Returns:
+        list: ffmpeg arguments to put before the MP4 output
+    """
+    if mode == FASTSTART_RESERVE:
+        moov_size = estimate_moov_size(probe_data or {}, codec_overrides)
+        if moov_size is not None:
+            return ['-moov_size', str(moov_size)]
+        mode = FASTSTART_RELOCATE
+    
+    if mode == FASTSTART_RELOCATE:
+        return ['-movflags', '+faststart']
+    
+    return []
+
+
+def _parse_rate(value):
+    """Parse an ffprobe rate such as '24000/1001' or '48000'."""
+    try:
+        if isinstance(value, str) and '/' in value:
+            numerator, denominator = value.split('/')
+            return float(numerator) / float(denominator) if float(denominator) else None
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,139 @@
+"""
+Per-file cleanup pipeline shared by the GUI and batch processing
+"""
+import os
+import time
+import threading
+
+from converter import convert_mkv_to_mp4
+from ffmpeg_progress import ConversionCancelled
+from subtitle_utils import process_mp4_subtitles
+from job_journal import JobJournal, STAGE_REMUX, STAGE_VERIFY, STAGE_RELEASE
+from preflight import (
+    estimate_output_size, reserve_output_space, record_throughput, describe_preflight
+)
+from media_handler import MediaHandler
+from metrics import stage_span
+from verify import verify_remux
+
+
+# Number of concurrent remuxes allowed on one device
+REMUX_SLOTS_PER_DEVICE = 1
+
+_device_slots = {}
+_device_slots_lock = threading.Lock()
+
+
+def get_device(path):
+    """Return the device id of the filesystem holding path."""
+    return os.stat(path).st_dev
+
+
+def _get_device_slot(path):
+    """Return the semaphore limiting remuxes on the device holding path."""
+    device = get_device(path)
+    with _device_slots_lock:
+        if device not in _device_slots:
+            _device_slots[device] = threading.BoundedSemaphore(REMUX_SLOTS_PER_DEVICE)
+        return _device_slots[device]
+
+
+def _probe_or_empty(media_handler, file_path):
+    """Get a file's ffprobe data, or an empty dict if probing fails."""
+    try:
+        return media_handler.probe(file_path)
+    except Exception as e:
+        print(f"Could not probe {file_path}: {e}")
+        return {}
+
+
+def process_media_file(file_path, release_source, cancel_event=None,
+                       status_callback=None, progress_callback=None,
+                       normalized_dedup=False):
+    """
+    Run the full cleanup for one media file.
+    
+    MKV files are converted to MP4 (one remux at a time per device, and
+    only if the output fits on the volume); once
+    the MP4 passes verification, the MKV is handed to release_source; then the MP4's subtitles are renamed
+    and deduplicated. The stages of an MKV's job are journaled, so a job
+    interrupted by a crash resumes where it stopped.
+    
+    Args:
+        file_path: Path to the MKV or MP4 file
+        release_source: Callable receiving the MKV path once the MP4 exists
+            and passed verification (moves it to the trash or deletes it)
+        cancel_event: Optional threading.Event to stop processing early
+        status_callback: Optional callable receiving status strings
+        progress_callback: Optional callable receiving ffmpeg progress dicts
+        normalized_dedup: Ignore BOM, line ending and trailing whitespace
+            differences when removing duplicate subtitles
+    
+    Returns:
+        str: Path to the resulting MP4 file
+    """
+    def report(message):
+        print(message)
+        if status_callback is not None:
+            status_callback(message)
+    
+    journal = None
+    
+    if file_path.lower().endswith('.mkv'):
+        journal = JobJournal(file_path)
+        media_handler = MediaHandler()
+        expected_output = os.path.splitext(file_path)[0] + '.mp4'
+        
+        # Preflight: the MP4 is a second copy of the streams on the same volume
+        output_size = None
+        if not journal.is_done(STAGE_REMUX):
+            output_size = estimate_output_size(_probe_or_empty(media_handler, file_path))
+            if output_size is not None:
+                report(describe_preflight(expected_output, output_size))
+        
+        with reserve_output_space(expected_output, output_size, cancel_event, report):
+            slot = _get_device_slot(file_path)
+            if not slot.acquire(blocking=False):
+                report("Waiting for another conversion on the same disk...")
+                while not slot.acquire(timeout=0.5):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ConversionCancelled("Conversion cancelled")
+            
+            try:
+                report("Converting to MP4...")
+                started = time.monotonic()
+                output_file = convert_mkv_to_mp4(file_path, cancel_event, progress_callback,
+                                                 journal=journal)
+                if output_size is not None:
+                    record_throughput(output_file, os.path.getsize(output_file), time.monotonic() - started)
+            finally:
+                slot.release()
+        
+        print(f"Conversion complete: {output_file}")
+        
+        if not journal.is_done(STAGE_VERIFY):
+            report("Verifying MP4...")
+            with stage_span(STAGE_VERIFY, output_file):
+                problems = verify_remux(media_handler, file_path, output_file)
+            if problems:
+                # Start over on the next attempt, and keep the MKV
+                journal.discard()
+                raise Exception(f"Verification failed, keeping the MKV: {'; '.join(problems)}")
+            journal.complete(STAGE_VERIFY)
+            print("Verification passed")
+        
+        release_source(file_path)
+        journal.complete(STAGE_RELEASE)
+        file_path = output_file
+    
+    if cancel_event is not None and cancel_event.is_set():
+        raise ConversionCancelled("Processing cancelled")
+    
+    report("Cleaning up subtitles...")
+    process_mp4_subtitles(file_path, normalized_dedup, journal)
+    print("Subtitle cleanup complete")
+    
+    if journal is not None:
+        journal.discard()
+    
+    return file_path
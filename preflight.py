@@ -0,0 +1,260 @@
+"""
+Disk space and throughput preflight for conversions
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from ffmpeg_progress import ConversionCancelled, format_duration
+from job_journal import get_temp_path, write_file_atomically
+from media_handler import format_file_size, get_statistics_tag
+from mp4_layout import estimate_moov_size
+from probe_cache import get_cache_dir
+from trash import get_mount_point
+from tv_profile import plan_conversion
+
+
+# Space kept free on top of the estimate, and slack for estimation errors
+SPACE_MARGIN_BYTES = 256 * 1024 * 1024
+SIZE_ESTIMATE_MARGIN = 1.02
+
+# Seconds between free-space checks while waiting for other conversions
+SPACE_WAIT_INTERVAL = 2
+
+# Weight of the newest measurement in the per-device throughput average;
+# outputs smaller than the minimum are too quick to measure anything
+THROUGHPUT_SMOOTHING = 0.3
+MIN_THROUGHPUT_SAMPLE_BYTES = 64 * 1024 * 1024
+
+
+class InsufficientSpaceError(Exception):
+    """Raised when the output cannot fit on the target volume."""
+
+
+def estimate_output_size(probe_data):
+    """
+    Estimate the size of the MP4 remuxed from a probed MKV.
+    
+    Each copied video/audio stream counts for its mkvmerge NUMBER_OF_BYTES
+    tag, or its bitrate times the duration; transcoded audio counts for
+    its target bitrate. If a stream's size is unknown, the whole source
+    size is used instead.
+    
+    Args:
+        probe_data: ffprobe JSON output with 'streams' and 'format' keys
+    
+    Returns:
+        int: Estimated bytes, or None if nothing is known
+    """
+    fmt = probe_data.get('format', {})
+    try:
+        duration = float(fmt['duration'])
+    except (KeyError, TypeError, ValueError):
+        duration = None
+    
+    plan = plan_conversion(probe_data)
+    transcoded = {entry['index']: entry['target'] for entry in plan['audio'] if entry['transcode']}
+    
+    total = 0
+    for stream in probe_data.get('streams', []):
+        if stream.get('codec_type') not in ('video', 'audio'):
+            continue
+        
+        if stream.get('index') in transcoded:
+            bitrate = _parse_bitrate(transcoded[stream['index']]['bitrate'])
+            size = bitrate * duration / 8 if duration else None
+        else:
+            size = _estimate_stream_size(stream, duration)
+        
+        if size is None:
+            # Fall back to the whole source (an upper bound for a copy)
+            try:
+                return int(int(fmt['size']) * SIZE_ESTIMATE_MARGIN)
+            except (KeyError, TypeError, ValueError):
+                return None
+        total += size
+    
+    total += estimate_moov_size(probe_data) or 0
+    return int(total * SIZE_ESTIMATE_MARGIN)
+
+
+def _estimate_stream_size(stream, duration):
+    """Estimate a copied stream's size in bytes, or None if unknown."""
+    tags = stream.get('tags', {})
+    size = get_statistics_tag(tags, 'NUMBER_OF_BYTES')
+    if size is not None:
+        return size
+    
+    bitrate = _parse_bitrate(stream.get('bit_rate')) or get_statistics_tag(tags, 'BPS')
+    if bitrate and duration:
+        return bitrate * duration / 8
+    return None
+
+
+def _parse_bitrate(value):
+    """Parse a bitrate such as '640k' or '192000' into bits per second."""
+    try:
+        if isinstance(value, str) and value.endswith('k'):
+            return float(value[:-1]) * 1000
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def get_free_space(path):
+    """
+    Get the free space on the volume holding path.
+    
+    Returns:
+        tuple: (mount point, bytes available to this user)
+    """
+    mount_point = get_mount_point(path)
+    stats = os.statvfs(mount_point)
+    return mount_point, stats.f_bavail * stats.f_frsize
+
+
+_reservations = {}  # mount point -> list of (estimated bytes, temporary output path)
+_reservations_lock = threading.Lock()
+
+
+def _outstanding_bytes(mount_point):
+    """Get the space still to be written by the conversions running on a volume."""
+    outstanding = 0
+    for size, temp_path in _reservations.get(mount_point, []):
+        try:
+            written = os.path.getsize(temp_path)
+        except OSError:
+            written = 0
+        outstanding += max(0, size - written)
+    return outstanding
+
+
+@contextmanager
+def reserve_output_space(output_path, size, cancel_event=None, report=print):
+    """
+    Hold space for an output on its volume while it is written.
+    
+    Space already promised to other conversions on the same volume (minus
+    what they have written so far) is not available. When the output does
+    not fit but other conversions are running, waits for them; when it
+    cannot fit at all, refuses.
+    
+    Args:
+        output_path: Final path of the output (written under its temporary name)
+        size: Estimated output size in bytes, or None to skip the check
+        cancel_event: Optional threading.Event to stop waiting
+        report: Callable receiving status strings
+    
+    Raises:
+        InsufficientSpaceError: If the output cannot fit on the volume
+        ConversionCancelled: If cancel_event was set while waiting
+    """
+    if size is None:
+        yield
+        return
+    
+    directory = os.path.dirname(os.path.abspath(output_path))
+    reservation = (size, get_temp_path(output_path))
+    waiting = False
+    
+    while True:
+        with _reservations_lock:
+            mount_point, free = get_free_space(directory)
+            others = _outstanding_bytes(mount_point)
+            if size + SPACE_MARGIN_BYTES <= free - others:
+                _reservations.setdefault(mount_point, []).append(reservation)
+                break
+        
+        if size + SPACE_MARGIN_BYTES > free:
+            raise InsufficientSpaceError(
+                f"Not enough space on {mount_point}: needs {format_file_size(size)} "
+                f"(+{format_file_size(SPACE_MARGIN_BYTES)} kept free), {format_file_size(free)} free"
+            )
+        
+        if not waiting:
+            report(f"Waiting for disk space on {mount_point}...")
+            waiting = True
+        if cancel_event is None:
+            time.sleep(SPACE_WAIT_INTERVAL)
+        elif cancel_event.wait(SPACE_WAIT_INTERVAL):
+            raise ConversionCancelled("Conversion cancelled")
+    
+    try:
+        yield
+    finally:
+        with _reservations_lock:
+            _reservations[mount_point].remove(reservation)
+
+
+_throughput_lock = threading.Lock()
+
+
+def _get_throughput_path():
+    """Return the file holding per-volume throughput history."""
+    return os.path.join(get_cache_dir(), 'throughput.json')
+
+
+def _load_throughput():
+    """Read the throughput history (mount point -> bytes per second)."""
+    try:
+        with open(_get_throughput_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_throughput(path, size, seconds):
+    """
+    Remember how fast a conversion wrote its output.
+    
+    Args:
+        path: Output path (identifies the volume)
+        size: Bytes written
+        seconds: Time the conversion took
+    """
+    if seconds <= 0 or size < MIN_THROUGHPUT_SAMPLE_BYTES:
+        return
+    
+    mount_point = get_mount_point(os.path.dirname(os.path.abspath(path)))
+    speed = size / seconds
+    
+    with _throughput_lock:
+        history = _load_throughput()
+        previous = history.get(mount_point)
+        if previous:
+            speed = THROUGHPUT_SMOOTHING * speed + (1 - THROUGHPUT_SMOOTHING) * previous
+        history[mount_point] = speed
+        
+        try:
+            os.makedirs(get_cache_dir(), exist_ok=True)
+            write_file_atomically(_get_throughput_path(), json.dumps(history).encode('utf-8'))
+        except OSError as e:
+            print(f"Could not save throughput history: {e}")
+
+
+def estimate_duration(path, size):
+    """
+    Predict how long writing an output will take, from past conversions.
+    
+    Returns:
+        float: Seconds, or None if the volume has no history yet
+    """
+    mount_point = get_mount_point(os.path.dirname(os.path.abspath(path)))
+    with _throughput_lock:
+        speed = _load_throughput().get(mount_point)
+    if not speed or size is None:
+        return None
+    return size / speed
+
+
+def describe_preflight(output_path, size):
+    """Describe a conversion's space needs and predicted duration in one line."""
+    _, free = get_free_space(os.path.dirname(os.path.abspath(output_path)))
+    description = f"Needs about {format_file_size(size)} ({format_file_size(free)} free)"
+    
+    seconds = estimate_duration(output_path, size)
+    if seconds is not None:
+        description += f", about {format_duration(seconds)}"
+    return description
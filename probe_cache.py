@@ -0,0 +1,291 @@
+"""
+Persistent cache for ffprobe results and subtitle language detection
+"""
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+
+
+# Upper bound for the total size of cached values
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Check the size bound every this many writes
+EVICTION_CHECK_INTERVAL = 100
+
+# Cache hits update last_used in memory; the touches are written with the
+# next store, once this many are pending, after this many seconds, or at exit
+TOUCH_FLUSH_COUNT = 500
+TOUCH_FLUSH_SECONDS = 30
+
+
+def get_cache_dir():
+    """Return the application cache directory (~/.cache/fixmovies)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'fixmovies')
+
+
+def file_identity(file_path):
+    """
+    Identify a file by (device, inode, size, mtime_ns).
+    
+    Returns:
+        tuple: The identity, or None if the file cannot be stat'ed
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class ProbeCache:
+    """
+    SQLite-backed key/value cache for per-file analysis results.
+    
+    Entries are keyed by the file's (device, inode) and a 'kind' string, and
+    are only returned while the file's size and mtime_ns are unchanged, so a
+    cache hit costs a single stat and a read: its last_used time is kept in
+    memory and written later, together with other work. Least recently used
+    entries are evicted once the total size of cached values exceeds
+    max_bytes.
+    """
+    
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            db_path: SQLite database path (defaults to ~/.cache/fixmovies/cache.sqlite)
+            max_bytes: Upper bound for the total size of cached values
+        """
+        self.db_path = db_path or os.path.join(get_cache_dir(), 'cache.sqlite')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched = {}  # (dev, ino, kind) -> last_used not written yet
+        self._last_flush = time.monotonic()
+        self._conn = None
+        
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " dev INTEGER, ino INTEGER, kind TEXT,"
+                " size INTEGER, mtime_ns INTEGER,"
+                " value TEXT, last_used REAL,"
+                " PRIMARY KEY (dev, ino, kind))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+            )
+            self._conn.commit()
+            atexit.register(self.flush)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Cache disabled, could not open {self.db_path}: {e}")
+            self._conn = None
+    
+    def get(self, file_path, kind):
+        """
+        Look up a cached value for a file.
+        
+        Args:
+            file_path: Path of the file the value was computed from
+            kind: Value type, e.g. 'ffprobe'
+        
+        Returns:
+            The cached (JSON-decoded) value, or None on a miss
+        """
+        identity = file_identity(file_path)
+        if self._conn is None or identity is None:
+            return None
+        
+        dev, ino, size, mtime_ns = identity
+        
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM entries"
+                    " WHERE dev = ? AND ino = ? AND kind = ? AND size = ? AND mtime_ns = ?",
+                    (dev, ino, kind, size, mtime_ns)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._touch([(dev, ino, kind)])
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Cache lookup failed for {file_path}: {e}")
+            return None
+    
+    def put(self, file_path, kind, value):
+        """
+        Store a value computed from a file.
+        
+        Args:
+            file_path: Path of the file the value was computed from
+            kind: Value type, e.g. 'ffprobe'
+            value: JSON-serializable value
+        """
+        identity = file_identity(file_path)
+        if self._conn is None or identity is None:
+            return
+        
+        dev, ino, size, mtime_ns = identity
+        
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries"
+                    " (dev, ino, kind, size, mtime_ns, value, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (dev, ino, kind, size, mtime_ns, json.dumps(value), time.time())
+                )
+                self._write_touches()
+                self._conn.commit()
+                
+                self._writes += 1
+                if self._writes % EVICTION_CHECK_INTERVAL == 1:
+                    self._evict()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Cache store failed for {file_path}: {e}")
+    
+    def get_many(self, file_paths, kind):
+        """
+        Look up cached values for many files at once.
+        
+        Returns:
+            dict: file path -> cached value, for the hits only
+        """
+        if self._conn is None:
+            return {}
+        
+        identities = {}
+        for file_path in file_paths:
+            identity = file_identity(file_path)
+            if identity is not None:
+                identities[file_path] = identity
+        
+        values = {}
+        try:
+            with self._lock:
+                hits = []
+                for file_path, (dev, ino, size, mtime_ns) in identities.items():
+                    row = self._conn.execute(
+                        "SELECT value FROM entries"
+                        " WHERE dev = ? AND ino = ? AND kind = ? AND size = ? AND mtime_ns = ?",
+                        (dev, ino, kind, size, mtime_ns)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    hits.append((dev, ino, kind))
+                    values[file_path] = json.loads(row[0])
+                self._touch(hits)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Cache lookup failed: {e}")
+        return values
+    
+    def put_many(self, values, kind):
+        """
+        Store values computed from many files in one transaction.
+        
+        Args:
+            values: dict of file path -> JSON-serializable value
+            kind: Value type, e.g. 'ffprobe'
+        """
+        if self._conn is None:
+            return
+        
+        rows = []
+        now = time.time()
+        for file_path, value in values.items():
+            identity = file_identity(file_path)
+            if identity is not None:
+                rows.append((*identity, kind, json.dumps(value), now))
+        
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries"
+                    " (dev, ino, size, mtime_ns, kind, value, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._write_touches()
+                self._conn.commit()
+                
+                self._writes += len(rows)
+                self._evict()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Cache store failed: {e}")
+    
+    def flush(self):
+        """Write the pending last_used touches of cache hits."""
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                if self._touched:
+                    self._write_touches()
+                    self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Cache flush failed: {e}")
+    
+    def _touch(self, keys):
+        """Remember that entries were used, writing the touches when due (lock held)."""
+        now = time.time()
+        for key in keys:
+            self._touched[key] = now
+        
+        if len(self._touched) >= TOUCH_FLUSH_COUNT or \
+                time.monotonic() - self._last_flush >= TOUCH_FLUSH_SECONDS:
+            self._write_touches()
+            self._conn.commit()
+    
+    def _write_touches(self):
+        """Add the pending touches to the current transaction (lock held)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE dev = ? AND ino = ? AND kind = ?",
+                [(last_used, *key) for key, last_used in self._touched.items()]
+            )
+            self._touched = {}
+        self._last_flush = time.monotonic()
+    
+    def _evict(self):
+        """Drop least recently used entries until under the size bound (lock held)."""
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        # Evict down to 90% of the bound so we do not evict on every write
+        target = self.max_bytes * 0.9
+        freed = 0
+        rows = self._conn.execute(
+            "SELECT rowid, LENGTH(value) FROM entries ORDER BY last_used"
+        ).fetchall()
+        doomed = []
+        for rowid, length in rows:
+            if total - freed <= target:
+                break
+            doomed.append((rowid,))
+            freed += length or 0
+        
+        self._conn.executemany("DELETE FROM entries WHERE rowid = ?", doomed)
+        self._conn.commit()
+        print(f"Cache evicted {len(doomed)} entries ({freed} bytes)")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Return the shared ProbeCache instance, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ProbeCache()
+        return _default_cache
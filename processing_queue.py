@@ -0,0 +1,203 @@
+"""
+Concurrent processing queue for batches of media files
+"""
+import os
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmpeg_progress import ConversionCancelled
+
+
+# Number of files processed at the same time (remuxes are further limited
+# per device by the pipeline)
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+MEDIA_EXTENSIONS = ('.mkv', '.mp4')
+
+
+def collect_media_files(paths):
+    """
+    Expand a list of files and directories into media files.
+    
+    Directories are searched recursively for MKV and MP4 files. Hidden
+    files and directories are skipped, including the .Trash folders that
+    released MKVs are moved to.
+    
+    Args:
+        paths: List of file or directory paths
+    
+    Returns:
+        list: Media file paths, in a stable order, without duplicates
+    """
+    media_files = []
+    seen = set()
+    
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for filename in files:
+                    if filename.lower().endswith(MEDIA_EXTENSIONS) and not filename.startswith('.'):
+                        found.append(os.path.join(root, filename))
+            candidates = sorted(found)
+        elif path.lower().endswith(MEDIA_EXTENSIONS):
+            candidates = [path]
+        else:
+            print(f"Skipping unsupported file: {path}")
+            candidates = []
+        
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                media_files.append(candidate)
+    
+    return media_files
+
+
+class QueueJob:
+    """State of one file in the processing queue."""
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    
+    def __init__(self, job_id, path):
+        self.id = job_id
+        self.path = path
+        self.state = QueueJob.QUEUED
+        self.status = "Queued"
+        self.fraction = 0.0
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+    
+    def is_finished(self):
+        """Return True once the job has stopped, whatever the outcome."""
+        return self.state in (QueueJob.DONE, QueueJob.FAILED, QueueJob.CANCELLED)
+
+
+class ProcessingQueue:
+    """
+    Processes many media files concurrently.
+    
+    Probing and subtitle work run in parallel on a thread pool; remuxes are
+    limited per device by the pipeline so two jobs never fight over the
+    same disk. on_update(job) is called from worker threads whenever a job's
+    state, status or progress changes.
+    """
+    
+    def __init__(self, release_source, on_update=None, max_workers=DEFAULT_MAX_WORKERS,
+                 normalized_dedup=False):
+        """
+        Args:
+            release_source: Callable receiving an MKV path once its MP4 exists
+                (called from worker threads)
+            on_update: Optional callable receiving a QueueJob on every change
+            max_workers: Number of files processed at the same time
+            normalized_dedup: Ignore BOM, line ending and trailing whitespace
+                differences when removing duplicate subtitles
+        """
+        self.release_source = release_source
+        self.normalized_dedup = normalized_dedup
+        self.on_update = on_update
+        self.jobs = []
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='queue')
+    
+    def add(self, paths):
+        """
+        Queue files (and media files found in directories) for processing.
+        
+        Args:
+            paths: List of file or directory paths
+        
+        Returns:
+            list: The QueueJob objects created
+        """
+        new_jobs = []
+        for path in collect_media_files(paths):
+            job = QueueJob(next(self._ids), path)
+            self.jobs.append(job)
+            new_jobs.append(job)
+            self._notify(job)
+            self._executor.submit(self._run, job)
+        
+        print(f"Queued {len(new_jobs)} file(s)")
+        return new_jobs
+    
+    def cancel(self, job):
+        """Cancel a queued or running job."""
+        job.cancel_event.set()
+    
+    def cancel_all(self):
+        """Cancel every job that has not finished yet."""
+        for job in self.jobs:
+            if not job.is_finished():
+                job.cancel_event.set()
+    
+    def is_busy(self):
+        """Return True while any job is queued or running."""
+        return any(not job.is_finished() for job in self.jobs)
+    
+    def shutdown(self, wait=False):
+        """Cancel outstanding jobs and stop the worker threads."""
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)
+    
+    def _run(self, job):
+        """Process one job on a worker thread."""
+        if job.cancel_event.is_set():
+            self._finish(job, QueueJob.CANCELLED, "Cancelled")
+            return
+        
+        job.state = QueueJob.RUNNING
+        self._update(job, "Starting...")
+        
+        def on_status(message):
+            self._update(job, message)
+        
+        def on_progress(progress):
+            if progress['fraction'] is not None:
+                job.fraction = progress['fraction']
+            self._notify(job)
+        
+        # Imported on first use: the conversion stack is not needed at startup
+        from pipeline import process_media_file
+        
+        try:
+            job.result = process_media_file(
+                job.path,
+                self.release_source,
+                job.cancel_event,
+                on_status,
+                on_progress,
+                self.normalized_dedup
+            )
+        except ConversionCancelled:
+            self._finish(job, QueueJob.CANCELLED, "Cancelled")
+        except Exception as e:
+            print(f"Error processing {job.path}: {e}")
+            job.error = e
+            self._finish(job, QueueJob.FAILED, f"Failed: {e}")
+        else:
+            job.fraction = 1.0
+            self._finish(job, QueueJob.DONE, "Complete")
+    
+    def _update(self, job, status):
+        """Set a job's status message and notify."""
+        job.status = status
+        self._notify(job)
+    
+    def _finish(self, job, state, status):
+        """Mark a job as finished and notify."""
+        job.state = state
+        self._update(job, status)
+    
+    def _notify(self, job):
+        """Report a job change to the listener."""
+        if self.on_update is not None:
+            self.on_update(job)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: time from launching the GUI to its first drawn frame
+Needs a display, like the GUI itself
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from probe_cache import get_cache_dir
+
+
+# Launches per measurement; the median is compared
+DEFAULT_RUNS = 5
+
+# Allowed slowdown over the baseline before the benchmark fails
+DEFAULT_TOLERANCE = 1.15
+
+# Seconds to wait for one launch to draw its window
+LAUNCH_TIMEOUT = 60
+
+# Flag and stdout line of main.py (see main.STARTUP_BENCHMARK_FLAG)
+STARTUP_BENCHMARK_FLAG = '--startup-benchmark'
+FIRST_FRAME_MARKER = 'First frame after'
+
+
+def get_baseline_path():
+    """Return the file holding this machine's startup baseline."""
+    return os.path.join(get_cache_dir(), 'startup-baseline.json')
+
+
+def measure_startup():
+    """
+    Launch the GUI once and wait for its first frame.
+    
+    Returns:
+        float: Seconds from launch to the first frame, interpreter start included
+    
+    Raises:
+        RuntimeError: If the window was not drawn
+    """
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, main_path, STARTUP_BENCHMARK_FLAG],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    
+    try:
+        for line in process.stdout:
+            if line.startswith(FIRST_FRAME_MARKER):
+                return time.perf_counter() - started
+        raise RuntimeError(f"The window was never drawn (exit code {process.wait()})")
+    finally:
+        try:
+            process.wait(timeout=LAUNCH_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def load_baseline():
+    """Read the baseline median in seconds, or None if there is none yet."""
+    try:
+        with open(get_baseline_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)['median']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_baseline(median):
+    """Store a new baseline median."""
+    os.makedirs(get_cache_dir(), exist_ok=True)
+    with open(get_baseline_path(), 'w', encoding='utf-8') as f:
+        json.dump({'median': median, 'recorded': time.time()}, f)
+
+
+def main(argv=None):
+    """Measure the time to first frame and compare it with the baseline."""
+    parser = argparse.ArgumentParser(description="Measure the GUI's time to first frame.")
+    parser.add_argument(
+        '--runs', type=int, default=DEFAULT_RUNS,
+        help=f"launches to measure (default: {DEFAULT_RUNS})"
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help=f"allowed ratio over the baseline (default: {DEFAULT_TOLERANCE})"
+    )
+    parser.add_argument(
+        '--update-baseline', action='store_true',
+        help="store this measurement as the new baseline"
+    )
+    args = parser.parse_args(argv)
+    
+    timings = []
+    for run in range(args.runs):
+        try:
+            timings.append(measure_startup())
+        except RuntimeError as e:
+            print(f"Run {run + 1} failed: {e}")
+            return 1
+        print(f"Run {run + 1}: {timings[-1] * 1000:.0f} ms")
+    
+    median = statistics.median(timings)
+    print(f"Time to first frame: {median * 1000:.0f} ms (median of {len(timings)})")
+    
+    baseline = load_baseline()
+    if args.update_baseline or baseline is None:
+        save_baseline(median)
+        print(f"Baseline saved to {get_baseline_path()}")
+        return 0
+    
+    print(f"Baseline: {baseline * 1000:.0f} ms")
+    if median > baseline * args.tolerance:
+        print(f"Startup regressed by {(median / baseline - 1) * 100:.0f}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
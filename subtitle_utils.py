@@ -2,26 +2,93 @@
 Subtitle processing and finalization for MP4 files
 """
 import os
-import shutil
+import re
+import codecs
+import filecmp
 import hashlib
+import itertools
 from collections import defaultdict
-from media_handler import MediaHandler
+from media_handler import MediaHandler, SUBTITLE_FALLBACK_ENCODING, is_subtitle_for
+from probe_cache import get_default_cache
+from directory_index import (
+    get_directory_index, record_file_added, record_file_moved, record_file_removed, tracking_changes
+)
+from job_journal import STAGE_NORMALIZE, STAGE_RENAME, STAGE_DEDUP, get_temp_path
+from metrics import STAGE_HASH, stage_span
 
 
-def process_mp4_subtitles(mp4_path):
+# Content digests: BLAKE2b is faster than SHA-256 and needs no extra package
+DIGEST_SIZE = 20
+HASH_CHUNK_SIZE = 1024 * 1024
+DIGEST_CACHE_KIND = 'blake2b-v1'
+NORMALIZED_DIGEST_CACHE_KIND = 'blake2b-normalized-v1'
+
+# Subtitle normalization: the encoding is guessed from the first bytes, then
+# the file is rewritten as UTF-8 SRT one cue at a time (constant memory)
+ENCODING_SAMPLE_BYTES = 64 * 1024
+NORMALIZED_CACHE_KIND = 'normalized-srt-v1'
+
+# Lines that are not UTF-8 are read as Windows-1252 only if that reading is
+# plausible: nearly all their high bytes must give Western European letters
+# or punctuation, and accented letters must stay a minority (Cyrillic or
+# Greek 8-bit text reads as mostly accented Latin letters). Otherwise the
+# bytes are kept as they are and only the SRT layout is canonicalized.
+WESTERN_CHARACTERS = frozenset(
+    'àáâãäåæçèéêëìíîïñòóôõöøùúûüýÿœšžß'
+    'ÀÁÂÃÄÅÆÇÈÉÊËÌÍÎÏÑÒÓÔÕÖØÙÚÛÜÝŸŒŠŽ'
+    '¡¿«»‘’‚“”„–—…•°€£ªº\u00a0'
+)
+MIN_WESTERN_SHARE = 0.9
+MAX_ACCENTED_LETTER_SHARE = 0.3
+
+# Reads every byte as one character and writes it back unchanged
+BYTE_LEVEL_ENCODING = 'latin-1'
+
+# Whitespace stripped from SRT lines (ASCII only, so that no byte of an
+# unknown 8-bit encoding is taken for whitespace)
+SRT_WHITESPACE = ' \t\r\n\x0b\x0c'
+
+# Files yielding fewer cues than this share of their timing lines (or none)
+# are not SRT, or not understood, and are left as they are
+MIN_NORMALIZED_CUE_RATIO = 0.5
+
+# Temporary names of subtitles being renamed: basename.renaming-N.srt
+RENAMING_INFIX = '.renaming-'
+
+# An SRT timestamp written with a dot before the milliseconds (00:01:02.345)
+DOTTED_TIMESTAMP = re.compile(r'(\d+:\d{2}:\d{2})\.(\d{3})')
+
+
+def process_mp4_subtitles(mp4_path, normalized_dedup=False, journal=None):
     """
     Process subtitles for MP4 file:
-    1. Rename all external subtitles to .lang.srt format
-    2. Remove duplicate subtitles (same content)
+    1. Rewrite all external subtitles as canonical UTF-8 SRT
+    2. Rename all external subtitles to .lang.srt format
+    3. Remove duplicate subtitles (same content)
     
     Args:
         mp4_path: Path to the MP4 file
+        normalized_dedup: Ignore BOM, line ending and trailing whitespace
+            differences when looking for duplicates
+        journal: Optional JobJournal; completed steps are skipped and
+            recorded
     """
     print(f"Processing subtitles for: {mp4_path}")
     
+    if journal is not None and journal.is_done(STAGE_DEDUP):
+        print("Subtitles already processed")
+        return
+    
     directory = os.path.dirname(mp4_path)
     basename = os.path.splitext(os.path.basename(mp4_path))[0]
     
+    # Normalize first: language detection and deduplication see clean UTF-8
+    if journal is None or not journal.is_done(STAGE_NORMALIZE):
+        with stage_span(STAGE_NORMALIZE, mp4_path):
+            normalize_subtitle_files(directory, basename)
+        if journal is not None:
+            journal.complete(STAGE_NORMALIZE)
+    
     # Get external subtitles
     media_handler = MediaHandler()
     _, external_subs = media_handler.analyze_file(mp4_path)
@@ -31,18 +98,299 @@ def process_mp4_subtitles(mp4_path):
         return
     
     # Rename all subtitles to .lang.srt format
-    renamed_subs = rename_subtitles_with_language(external_subs, basename, directory)
+    if journal is not None and journal.is_done(STAGE_RENAME):
+        renamed_subs = external_subs
+    else:
+        with stage_span(STAGE_RENAME, mp4_path):
+            renamed_subs = rename_subtitles_with_language(external_subs, basename, directory)
+        if journal is not None:
+            journal.complete(STAGE_RENAME)
     
     # Remove duplicate subtitles
-    remove_duplicate_subtitles(renamed_subs)
+    with stage_span(STAGE_DEDUP, mp4_path) as span:
+        for sub in renamed_subs:
+            span.add_file_size(sub['path'])
+        remove_duplicate_subtitles(renamed_subs, normalized_dedup)
+    if journal is not None:
+        journal.complete(STAGE_DEDUP)
     
     print("Subtitle processing complete")
 
 
+def normalize_subtitle_files(directory, basename):
+    """
+    Normalize every external subtitle of a video (see normalize_subtitle_file).
+    
+    Returns:
+        list: Paths of the files that were rewritten
+    """
+    print("Normalizing subtitles to UTF-8 SRT...")
+    
+    try:
+        filenames = get_directory_index(directory or '.').with_prefix(basename)
+    except OSError as e:
+        print(f"  Error listing {directory}: {e}")
+        return []
+    
+    changed = []
+    for filename in filenames:
+        if is_subtitle_for(filename, basename):
+            path = os.path.join(directory, filename)
+            if normalize_subtitle_file(path):
+                changed.append(path)
+    
+    if not changed:
+        print("  All subtitles already normalized")
+    return changed
+
+
+def normalize_subtitle_file(file_path):
+    """
+    Rewrite a subtitle file in place as canonical UTF-8 SRT.
+    
+    The file is streamed through iter_canonical_srt() into a temporary
+    file, which replaces the original only if the content changed. Unless
+    it is UTF-16, each line is decoded on its own (UTF-8, else
+    Windows-1252), so a file mixing both encodings keeps its UTF-8 lines
+    intact. When the Windows-1252 reading of the other lines is not
+    plausible (another 8-bit code page, such as Cyrillic or Central
+    European), the bytes are kept as they are and only the layout is
+    canonicalized. Files that are not SRT (no timing lines, such as
+    MicroDVD or renamed ASS files) or lose too many cues are left
+    untouched. Checked files are remembered in the persistent cache.
+    
+    Args:
+        file_path: Path to the subtitle file
+    
+    Returns:
+        bool: True if the file was rewritten
+    """
+    cache = get_default_cache()
+    if cache.get(file_path, NORMALIZED_CACHE_KIND):
+        return False
+    
+    filename = os.path.basename(file_path)
+    temp_path = get_temp_path(file_path)
+    
+    try:
+        # The temporary file and the replacement are our only changes
+        with tracking_changes(os.path.dirname(file_path)):
+            encoding = detect_subtitle_encoding(file_path)
+            timings, cues, fallback = _write_canonical_srt(file_path, temp_path, encoding)
+            if fallback['lines']:
+                if _is_plausible_fallback(fallback):
+                    encoding = f"{SUBTITLE_FALLBACK_ENCODING} in {fallback['lines']} line(s)"
+                else:
+                    encoding = BYTE_LEVEL_ENCODING
+                    timings, cues, _ = _write_canonical_srt(file_path, temp_path, encoding)
+            
+            if cues == 0 or cues < timings * MIN_NORMALIZED_CUE_RATIO:
+                print(f"  Leaving {filename} as it is: not SRT ({cues} cue(s) read from {timings} timing line(s))")
+                os.remove(temp_path)
+                changed = False
+            elif filecmp.cmp(file_path, temp_path, shallow=False):
+                os.remove(temp_path)
+                changed = False
+            else:
+                os.replace(temp_path, file_path)
+                record_file_added(file_path)
+                if encoding == BYTE_LEVEL_ENCODING:
+                    print(f"  Normalized {filename} (layout only, unknown 8-bit encoding kept)")
+                else:
+                    print(f"  Normalized {filename} ({encoding} -> UTF-8 SRT)")
+                changed = True
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"  Error normalizing {filename}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    
+    cache.put(file_path, NORMALIZED_CACHE_KIND, True)
+    return changed
+
+
+def detect_subtitle_encoding(file_path):
+    """
+    Guess the encoding of a subtitle file from its first ENCODING_SAMPLE_BYTES.
+    
+    A BOM decides; otherwise the sample is tried as UTF-8, and anything
+    else is taken as SUBTITLE_FALLBACK_ENCODING (Windows-1252, which also
+    reads Latin-1 French subtitles). Only UTF-16 changes how the file is
+    read: other files are decoded line by line (see _iter_decoded_lines).
+    
+    Returns:
+        str: Python codec name
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    
+    try:
+        # The sample may end in the middle of a character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return SUBTITLE_FALLBACK_ENCODING
+
+
+def _write_canonical_srt(source_path, target_path, encoding):
+    """
+    Stream a subtitle file into a canonical SRT file.
+    
+    Args:
+        source_path: Subtitle file to read
+        target_path: File to write (UTF-8, or the source's own bytes with
+            BYTE_LEVEL_ENCODING)
+        encoding: 'utf-16', BYTE_LEVEL_ENCODING, or anything else to
+            decode each line as UTF-8 or else Windows-1252
+    
+    Returns:
+        tuple: (timing lines read, cues written, statistics of the lines
+            read as Windows-1252 (see _iter_decoded_lines))
+    
+    Raises:
+        UnicodeDecodeError: If a UTF-16 file holds invalid data
+    """
+    timings = 0
+    cues = 0
+    fallback = {'lines': 0, 'high': 0, 'western': 0, 'accented': 0, 'letters': 0}
+    output_encoding = BYTE_LEVEL_ENCODING if encoding == BYTE_LEVEL_ENCODING else 'utf-8'
+    
+    def count_timings(lines):
+        nonlocal timings
+        for line in lines:
+            if '-->' in line:
+                timings += 1
+            yield line
+    
+    with open(source_path, 'rb') as source, \
+            open(target_path, 'w', encoding=output_encoding, newline='\n') as target:
+        for cue in iter_canonical_srt(count_timings(_iter_decoded_lines(source, encoding, fallback))):
+            target.write(cue)
+            cues += 1
+        target.flush()
+        os.fsync(target.fileno())
+    
+    return timings, cues, fallback
+
+
+def _iter_decoded_lines(source, encoding, fallback):
+    """
+    Decode a binary subtitle file line by line.
+    
+    UTF-16 is decoded as a whole stream and BYTE_LEVEL_ENCODING byte for
+    byte. Anything else is decoded line by line, as UTF-8 or else
+    Windows-1252, so one stray Windows-1252 line does not turn the UTF-8
+    accents of the others into mojibake. CR, LF and CRLF all end a line.
+    
+    Args:
+        source: Binary file object
+        encoding: See _write_canonical_srt
+        fallback: dict of counters updated for the Windows-1252 lines:
+            'lines', 'high' (bytes above 0x7F), 'western' (those read as
+            WESTERN_CHARACTERS), 'accented' (non-ASCII letters) and
+            'letters' (all letters)
+    """
+    if encoding == 'utf-16':
+        yield from codecs.getreader(encoding)(source)
+        return
+    
+    for line in source:
+        for part in line.splitlines():
+            if encoding == BYTE_LEVEL_ENCODING:
+                yield part.decode(BYTE_LEVEL_ENCODING)
+                continue
+            try:
+                yield part.decode('utf-8')
+            except UnicodeDecodeError:
+                text = part.decode(SUBTITLE_FALLBACK_ENCODING, errors='replace')
+                fallback['lines'] += 1
+                fallback['high'] += sum(1 for byte in part if byte > 0x7f)
+                fallback['western'] += sum(1 for char in text if char in WESTERN_CHARACTERS)
+                fallback['accented'] += sum(1 for char in text if not char.isascii() and char.isalpha())
+                fallback['letters'] += sum(1 for char in text if char.isalpha())
+                yield text
+
+
+def _is_plausible_fallback(fallback):
+    """Check if lines read as Windows-1252 look like Western European text."""
+    return fallback['western'] >= fallback['high'] * MIN_WESTERN_SHARE and \
+        fallback['accented'] <= fallback['letters'] * MAX_ACCENTED_LETTER_SHARE
+
+
+def iter_canonical_srt(lines):
+    """
+    Canonicalize SRT lines as they stream by, one cue at a time.
+    
+    Cues are renumbered from 1 and separated by exactly one blank line;
+    a BOM, trailing whitespace, blank lines inside cues, empty cues and text
+    before the first cue are dropped, and timestamps use a comma before
+    the milliseconds. A number line is taken as a cue number only when a
+    timestamp line follows it.
+    
+    Args:
+        lines: Iterable of text lines (e.g. a text file)
+    
+    Yields:
+        str: One canonical cue, ending with a blank line
+    """
+    number = 0
+    cue = None      # Timestamp line and text lines of the current cue
+    held = []       # Number lines that may be the next cue's number
+    first = True
+    
+    for line in lines:
+        line = line.rstrip(SRT_WHITESPACE)
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        stripped = line.lstrip(SRT_WHITESPACE)
+        
+        if '-->' in line:
+            # The number line right before a timestamp is the cue number,
+            # earlier ones are text of the previous cue
+            if cue is not None:
+                cue.extend(held[:-1])
+                if len(cue) > 1:
+                    number += 1
+                    yield _format_cue(number, cue)
+            cue = [DOTTED_TIMESTAMP.sub(r'\1,\2', stripped)]
+            held = []
+        elif stripped.isascii() and stripped.isdigit():
+            held.append(line)
+        elif line:
+            if cue is not None:
+                cue.extend(held)
+                cue.append(line)
+            held = []
+    
+    if cue is not None:
+        cue.extend(held)
+        if len(cue) > 1:
+            number += 1
+            yield _format_cue(number, cue)
+
+
+def _format_cue(number, cue):
+    """Format a cue (timestamp line, then text lines) as SRT."""
+    return f"{number}\n" + '\n'.join(cue) + '\n\n'
+
+
 def rename_subtitles_with_language(external_subs, basename, directory):
     """
     Rename all external subtitles to follow .lang.srt or .lang-N.srt format.
     
+    Files are first moved to temporary basename.renaming-N.srt names, then
+    to their final names, so one file never overwrites another whose new
+    name it takes. Every step is an atomic rename; after a crash the
+    temporary names still match the video, so the leftovers come back in
+    external_subs and are renamed on the next run. Temporary names are
+    never ones already in use, leftovers included.
+    
     Args:
         external_subs: List of external subtitle dicts
         basename: Base filename without extension
@@ -59,6 +407,8 @@ def rename_subtitles_with_language(external_subs, basename, directory):
         lang_groups[sub['language']].append(sub)
     
     renamed_subs = []
+    pending = []  # (sub, temporary path, new path)
+    taken = {sub['path'] for sub in external_subs}
     
     for language, subs in lang_groups.items():
         for i, sub in enumerate(subs):
@@ -85,60 +435,91 @@ def rename_subtitles_with_language(external_subs, basename, directory):
                 })
                 continue
             
-            # Rename file
+            if RENAMING_INFIX in old_filename:
+                print(f"  Recovering {old_filename} from an interrupted rename")
+            
+            # First step: move out of the way of the other renames
+            temp_path = _get_free_renaming_path(directory, basename, taken)
             try:
-                print(f"  Renaming: {old_filename} -> {new_filename}")
-                shutil.move(old_path, new_path)
-                renamed_subs.append({
-                    'language': language,
-                    'path': new_path,
-                    'filename': new_filename
-                })
+                with tracking_changes(directory):
+                    os.replace(old_path, temp_path)
+                    record_file_moved(old_path, temp_path)
+                pending.append((sub, temp_path, new_path))
             except Exception as e:
                 print(f"  Error renaming {old_filename}: {e}")
                 # Keep original on error
                 renamed_subs.append(sub)
     
+    for sub, temp_path, new_path in pending:
+        new_filename = os.path.basename(new_path)
+        try:
+            print(f"  Renaming: {sub['filename']} -> {new_filename}")
+            if os.path.exists(new_path):
+                raise FileExistsError(f"{new_filename} already exists")
+            with tracking_changes(directory):
+                os.replace(temp_path, new_path)
+                record_file_moved(temp_path, new_path)
+            renamed_subs.append({
+                'language': sub['language'],
+                'path': new_path,
+                'filename': new_filename
+            })
+        except Exception as e:
+            print(f"  Error renaming {sub['filename']}: {e}")
+            # Keep the file under its temporary name on error
+            renamed_subs.append(dict(sub, path=temp_path, filename=os.path.basename(temp_path)))
+    
     return renamed_subs
 
 
-def remove_duplicate_subtitles(subtitle_list):
+def _get_free_renaming_path(directory, basename, taken):
+    """
+    Pick a temporary name for a rename that no file uses.
+    
+    Args:
+        directory: Directory path
+        basename: Base filename without extension
+        taken: Set of paths not to use; the returned path is added to it
+    
+    Returns:
+        str: Path of the form basename.renaming-N.srt
+    """
+    for n in itertools.count(1):
+        temp_path = os.path.join(directory, f"{basename}{RENAMING_INFIX}{n}.srt")
+        if temp_path not in taken and not os.path.lexists(temp_path):
+            taken.add(temp_path)
+            return temp_path
+
+
+def remove_duplicate_subtitles(subtitle_list, normalized=False):
     """
     Remove duplicate subtitle files (same content).
     Keep the first occurrence, delete the rest.
     
     Args:
         subtitle_list: List of subtitle dicts with 'path' key
+        normalized: Also treat files differing only by BOM, line endings
+            or trailing whitespace as duplicates
     """
     print("Checking for duplicate subtitles...")
     
-    # Dictionary to store hash -> first file with that hash
-    hash_to_file = {}
+    paths = [sub['path'] for sub in subtitle_list if os.path.exists(sub['path'])]
     files_to_delete = []
     
-    for sub in subtitle_list:
-        file_path = sub['path']
-        
-        if not os.path.exists(file_path):
-            continue
-        
-        # Calculate file hash
-        file_hash = calculate_file_hash(file_path)
-        
-        if file_hash in hash_to_file:
-            # Duplicate found
-            original = hash_to_file[file_hash]
-            print(f"  Duplicate found: {sub['filename']} (same as {os.path.basename(original)})")
+    for group in find_duplicate_files(paths, normalized):
+        # Groups keep the input order: the first file is the one to keep
+        original = group[0]
+        for file_path in group[1:]:
+            print(f"  Duplicate found: {os.path.basename(file_path)} (same as {os.path.basename(original)})")
             files_to_delete.append(file_path)
-        else:
-            # First occurrence of this content
-            hash_to_file[file_hash] = file_path
     
     # Delete duplicate files
     for file_path in files_to_delete:
         try:
             print(f"  Deleting duplicate: {os.path.basename(file_path)}")
-            os.remove(file_path)
+            with tracking_changes(os.path.dirname(file_path)):
+                os.remove(file_path)
+                record_file_removed(file_path)
         except Exception as e:
             print(f"  Error deleting {os.path.basename(file_path)}: {e}")
     
@@ -148,9 +529,100 @@ def remove_duplicate_subtitles(subtitle_list):
         print(f"  Removed {len(files_to_delete)} duplicate subtitle(s)")
 
 
+def find_duplicate_files(paths, normalized=False):
+    """
+    Group files with identical content.
+    
+    Files are bucketed by size first and only size collisions are hashed
+    (in normalized mode sizes prove nothing, so every file is hashed).
+    Digests are kept in the persistent cache.
+    
+    Args:
+        paths: File paths to compare
+        normalized: Compare normalized subtitle text (see normalize_subtitle_bytes)
+    
+    Returns:
+        list: Lists of paths with the same content (groups of 2 or more,
+            in input order)
+    """
+    by_size = defaultdict(list)
+    for path in paths:
+        try:
+            size = 0 if normalized else os.path.getsize(path)
+        except OSError:
+            continue
+        by_size[size].append(path)
+    
+    duplicates = []
+    for same_size in by_size.values():
+        if len(same_size) < 2:
+            continue
+        by_hash = defaultdict(list)
+        for path in same_size:
+            by_hash[get_file_digest(path, normalized)].append(path)
+        duplicates.extend(group for group in by_hash.values() if len(group) > 1)
+    
+    return duplicates
+
+
+def get_file_digest(file_path, normalized=False):
+    """
+    Get the content digest of a file, using the persistent cache when possible.
+    
+    Args:
+        file_path: Path to the file
+        normalized: Hash the normalized subtitle text instead of the raw bytes
+    
+    Returns:
+        str: Hexadecimal digest (see hash_bytes)
+    """
+    kind = NORMALIZED_DIGEST_CACHE_KIND if normalized else DIGEST_CACHE_KIND
+    cache = get_default_cache()
+    
+    digest = cache.get(file_path, kind)
+    if digest is not None:
+        return digest
+    
+    with stage_span(STAGE_HASH, file_path) as span:
+        span.add_file_size(file_path)
+        if normalized:
+            try:
+                with open(file_path, 'rb') as f:
+                    digest = hash_bytes(normalize_subtitle_bytes(f.read()))
+            except OSError as e:
+                print(f"Error calculating hash for {file_path}: {e}")
+                return f"error_{file_path}"
+        else:
+            digest = calculate_file_hash(file_path)
+            if digest.startswith('error_'):
+                return digest
+    
+    cache.put(file_path, kind, digest)
+    return digest
+
+
+def normalize_subtitle_bytes(data):
+    """
+    Remove differences that do not change what is displayed.
+    
+    Strips a UTF-8 BOM, converts CRLF/CR line endings to LF, removes
+    trailing whitespace on every line and trailing blank lines.
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    lines = [line.rstrip() for line in data.split(b'\n')]
+    return b'\n'.join(lines).rstrip(b'\n')
+
+
+def hash_bytes(data):
+    """Hash in-memory content the same way calculate_file_hash hashes files."""
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
 def calculate_file_hash(file_path):
     """
-    Calculate SHA256 hash of a file.
+    Calculate the BLAKE2b hash of a file.
     
     Args:
         file_path: Path to the file
@@ -158,14 +630,14 @@ def calculate_file_hash(file_path):
     Returns:
         str: Hexadecimal hash string
     """
-    sha256_hash = hashlib.sha256()
+    file_hash = hashlib.blake2b(digest_size=DIGEST_SIZE)
     
     try:
         with open(file_path, 'rb') as f:
-            # Read file in chunks to handle large files
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+            # Read file in large chunks: subtitles usually fit in one read
+            for byte_block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                file_hash.update(byte_block)
+        return file_hash.hexdigest()
     except Exception as e:
         print(f"Error calculating hash for {file_path}: {e}")
         # Return a unique value if hash fails
@@ -0,0 +1,102 @@
+"""
+Directory watching for external subtitle changes
+"""
+import os
+import gi
+
+gi.require_version('Gio', '2.0')
+from gi.repository import Gio, GLib
+
+from media_handler import is_subtitle_for
+
+
+# Delay before a burst of file events is delivered
+DEFAULT_DEBOUNCE_MS = 300
+
+
+class SubtitleWatcher:
+    """
+    Watches a video's directory for basename*.srt files being created,
+    renamed or deleted.
+    
+    Events are collected and delivered in one batch after the directory
+    has been quiet for debounce_ms, as on_changes(added, removed): two lists
+    of filenames. 'added' also covers files that were rewritten in place.
+    Callbacks run on the GTK main loop.
+    """
+    
+    def __init__(self, video_path, on_changes, debounce_ms=DEFAULT_DEBOUNCE_MS):
+        """
+        Args:
+            video_path: Path of the video whose subtitles are watched
+            on_changes: Callable receiving (added_filenames, removed_filenames)
+            debounce_ms: Quiet period before pending events are delivered
+        """
+        self.directory = os.path.dirname(video_path)
+        self.basename = os.path.splitext(os.path.basename(video_path))[0]
+        self.on_changes = on_changes
+        self.debounce_ms = debounce_ms
+        self._pending = set()
+        self._timeout_id = None
+        
+        directory = Gio.File.new_for_path(self.directory)
+        self._monitor = directory.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+        self._monitor.connect("changed", self._on_changed)
+        print(f"Watching {self.directory} for {self.basename}*.srt")
+    
+    def stop(self):
+        """Stop watching and drop pending events."""
+        if self._timeout_id is not None:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = None
+        self._pending.clear()
+        self._monitor.cancel()
+    
+    def _on_changed(self, monitor, file, other_file, event_type):
+        """Record events for matching subtitle files."""
+        relevant = (
+            Gio.FileMonitorEvent.CREATED,
+            Gio.FileMonitorEvent.DELETED,
+            Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+            Gio.FileMonitorEvent.MOVED_IN,
+            Gio.FileMonitorEvent.MOVED_OUT,
+            Gio.FileMonitorEvent.RENAMED,
+        )
+        if event_type not in relevant:
+            return
+        
+        # RENAMED reports the old name in file and the new one in other_file
+        for changed in (file, other_file):
+            if changed is None:
+                continue
+            filename = changed.get_basename()
+            if is_subtitle_for(filename, self.basename):
+                self._pending.add(filename)
+        
+        if self._pending:
+            self._schedule_flush()
+    
+    def _schedule_flush(self):
+        """(Re)start the debounce timer."""
+        if self._timeout_id is not None:
+            GLib.source_remove(self._timeout_id)
+        self._timeout_id = GLib.timeout_add(self.debounce_ms, self._flush)
+    
+    def _flush(self):
+        """Deliver pending events, resolved against the current directory state."""
+        self._timeout_id = None
+        pending, self._pending = self._pending, set()
+        
+        added = []
+        removed = []
+        for filename in sorted(pending):
+            if os.path.exists(os.path.join(self.directory, filename)):
+                added.append(filename)
+            else:
+                removed.append(filename)
+        
+        if added or removed:
+            print(f"Subtitle files changed: +{added} -{removed}")
+            self.on_changes(added, removed)
+        
+        return False
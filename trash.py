@@ -0,0 +1,73 @@
+"""
+Moving files to the volume's .Trash folder
+"""
+import os
+import shutil
+
+from directory_index import record_file_moved
+from metrics import STAGE_TRASH, stage_span
+
+
+def get_mount_point(path):
+    """Get the mount point for a given path, resolving symlinks."""
+    # Resolve all symbolic links first
+    path = os.path.realpath(path)
+    path = os.path.abspath(path)
+    
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            # Reached root
+            break
+        path = parent
+    return path
+
+
+def find_trash_dir(file_path):
+    """
+    Find the .Trash folder on the volume holding file_path.
+    
+    Returns:
+        str: Path of the .Trash folder, or None if the volume has none
+    """
+    mount_point = get_mount_point(os.path.dirname(file_path))
+    trash_dir = os.path.join(mount_point, '.Trash')
+    
+    if os.path.exists(trash_dir) and os.path.isdir(trash_dir):
+        return trash_dir
+    return None
+
+
+def move_to_trash(file_path):
+    """
+    Move a file to the .Trash folder of its volume.
+    
+    Args:
+        file_path: Path of the file to move
+    
+    Returns:
+        str: The path inside the trash, or None if the volume has no .Trash
+    
+    Raises:
+        OSError: If the move fails
+    """
+    trash_dir = find_trash_dir(file_path)
+    if trash_dir is None:
+        return None
+    
+    filename = os.path.basename(file_path)
+    trash_path = os.path.join(trash_dir, filename)
+    
+    # Handle name collision in trash
+    counter = 1
+    while os.path.exists(trash_path):
+        base, ext = os.path.splitext(filename)
+        trash_path = os.path.join(trash_dir, f"{base}_{counter}{ext}")
+        counter += 1
+    
+    print(f"Moving {file_path} to {trash_path}")
+    with stage_span(STAGE_TRASH, file_path) as span:
+        span.add_file_size(file_path)
+        shutil.move(file_path, trash_path)
+    record_file_moved(file_path, trash_path)
+    return trash_path
@@ -0,0 +1,146 @@
+"""
+Samsung TV compatibility profile and per-stream conversion plan
+"""
+
+
+# What the Samsung TV plays from an MP4
+SAMSUNG_PROFILE = {
+    'video_codecs': {'h264', 'hevc', 'mpeg4', 'mpeg2video', 'vp9', 'av1'},
+    # Profiles the TV cannot decode, per video codec
+    'unsupported_video_profiles': {
+        'h264': {'High 10', 'High 4:2:2', 'High 4:4:4 Predictive'},
+        'hevc': {'Rext'},
+    },
+    # Allowed audio codecs and their maximum channel count
+    'audio_codecs': {
+        'aac': 6,
+        'ac3': 6,
+        'eac3': 8,
+        'mp3': 2,
+    },
+    # Replacement for audio streams that cannot be copied: stereo and mono
+    # go to AAC, multichannel to AC-3 (5.1 at most)
+    'stereo_audio': {'codec': 'aac', 'bitrate': '192k', 'channels': 2},
+    'surround_audio': {'codec': 'ac3', 'bitrate': '640k', 'channels': 6},
+}
+
+# Conversion modes
+MODE_COPY = 'copy'                        # Every stream is copied
+MODE_TRANSCODE_AUDIO = 'transcode-audio'  # Some audio streams are re-encoded
+
+
+def plan_conversion(probe_data, profile=SAMSUNG_PROFILE):
+    """
+    Check the streams of a file against a TV profile.
+    
+    Video is always stream-copied (problems are only reported); audio
+    streams the TV cannot play are planned for transcoding.
+    
+    Args:
+        probe_data: ffprobe JSON output with 'streams'
+        profile: Compatibility profile (defaults to SAMSUNG_PROFILE)
+    
+    Returns:
+        dict: 'mode' (MODE_COPY or MODE_TRANSCODE_AUDIO), 'audio' (one dict
+            per audio stream in output order, with 'index', 'codec',
+            'channels', 'transcode' and, when transcoded, 'reason' and
+            'target') and 'video_warnings' (list of strings)
+    """
+    audio = []
+    video_warnings = []
+    
+    for stream in probe_data.get('streams', []):
+        codec = stream.get('codec_name', 'unknown')
+        codec_type = stream.get('codec_type')
+        
+        if codec_type == 'video':
+            if stream.get('disposition', {}).get('attached_pic'):
+                continue
+            if codec not in profile['video_codecs']:
+                video_warnings.append(f"video codec {codec} is not supported by the TV")
+            elif stream.get('profile') in profile['unsupported_video_profiles'].get(codec, ()):
+                video_warnings.append(f"{codec} profile {stream['profile']} is not supported by the TV")
+        
+        elif codec_type == 'audio':
+            channels = stream.get('channels') or 2
+            entry = {
+                'index': stream.get('index', 0),
+                'codec': codec,
+                'channels': channels,
+                'transcode': False
+            }
+            
+            max_channels = profile['audio_codecs'].get(codec)
+            if max_channels is None:
+                entry['reason'] = f"{codec} is not supported by the TV"
+            elif channels > max_channels:
+                entry['reason'] = f"{channels} channels (at most {max_channels} for {codec})"
+            
+            if 'reason' in entry:
+                entry['transcode'] = True
+                entry['target'] = profile['stereo_audio'] if channels <= 2 else profile['surround_audio']
+            
+            audio.append(entry)
+    
+    mode = MODE_TRANSCODE_AUDIO if any(entry['transcode'] for entry in audio) else MODE_COPY
+    return {'mode': mode, 'audio': audio, 'video_warnings': video_warnings}
+
+
+def get_audio_options(plan):
+    """
+    Get the ffmpeg output options transcoding the planned audio streams.
+    
+    The options override '-codec copy' for the offending streams only, and
+    let the encoder use every CPU core.
+    
+    Args:
+        plan: dict from plan_conversion
+    
+    Returns:
+        list: ffmpeg arguments (empty for a copy-only plan)
+    """
+    options = []
+    for output_index, entry in enumerate(plan['audio']):
+        if not entry['transcode']:
+            continue
+        target = entry['target']
+        options += [
+            f"-c:a:{output_index}", target['codec'],
+            f"-b:a:{output_index}", target['bitrate'],
+            f"-ac:a:{output_index}", str(min(entry['channels'], target['channels'])),
+        ]
+    
+    if options:
+        options += ['-threads', '0']
+    return options
+
+
+def get_codec_overrides(plan):
+    """
+    Get the codecs the transcoded audio streams will have in the output.
+    
+    Returns:
+        dict: input stream index -> output codec name
+    """
+    return {entry['index']: entry['target']['codec'] for entry in plan['audio'] if entry['transcode']}
+
+
+def describe_plan(plan):
+    """
+    Describe a conversion plan in one line.
+    
+    Returns:
+        str: e.g. 'Copy only' or 'Transcode audio: #1 dts 6ch -> ac3'
+    """
+    if plan['mode'] == MODE_COPY:
+        description = "Copy only"
+    else:
+        streams = ', '.join(
+            f"#{entry['index']} {entry['codec']} {entry['channels']}ch -> {entry['target']['codec']}"
+            for entry in plan['audio'] if entry['transcode']
+        )
+        description = f"Transcode audio: {streams}"
+    
+    if plan['video_warnings']:
+        description += f" ({'; '.join(plan['video_warnings'])})"
+    return description
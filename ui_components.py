@@ -3,14 +3,21 @@ UI Components for Samsung TV Media File Converter
 """
 import os
 import subprocess
+import threading
+import urllib.parse
 import gi
 
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GLib
 
-from media_handler import MediaHandler
-from converter import convert_mkv_to_mp4
-from subtitle_utils import process_mp4_subtitles
+from media_handler import MediaHandler, PLAN_LABELS, describe_track_size
+from ffmpeg_progress import describe_progress
+from processing_queue import ProcessingQueue, QueueJob
+from jobs import BackgroundJob, run_on_main_thread
+from subtitle_watcher import SubtitleWatcher
+from trash import find_trash_dir, move_to_trash
+from tv_profile import plan_conversion, describe_plan
+from directory_index import record_file_removed
 
 
 class MainWindow(Gtk.Window):
@@ -23,13 +30,19 @@ class MainWindow(Gtk.Window):
         
         self.current_file = None
         self.media_handler = MediaHandler()
-        self.last_subtitle_list = []
+        self.subtitle_watcher = None
+        self.current_job = None
+        self.size_scan_job = None
+        self.language_sample_job = None
+        self.progress_timeout_id = None
+        self.release_lock = threading.Lock()
+        self.queue = ProcessingQueue(self._release_source, self._on_queue_update_threaded)
+        self.queue_rows = {}
         
         self._build_ui()
         self._setup_drag_and_drop()
         
-        # Set up focus event to check for new subtitles
-        self.connect("focus-in-event", self._on_window_focus)
+        self.connect("destroy", self._on_destroy)
     
     def _build_ui(self):
         """Build the user interface."""
@@ -38,7 +51,7 @@ class MainWindow(Gtk.Window):
         
         # Drop zone message (shown when no file loaded)
         self.drop_zone = Gtk.Label()
-        self.drop_zone.set_markup("<span size='large' color='#999999'><i>Drop a video file anywhere in the window (MKV or MP4)</i></span>")
+        self.drop_zone.set_markup("<span size='large' color='#999999'><i>Drop a video file anywhere in the window (MKV or MP4)\nDrop several files or folders to process them as a batch</i></span>")
         self.drop_zone.set_size_request(-1, 30)
         main_box.pack_start(self.drop_zone, False, False, 10)
         
@@ -68,6 +81,11 @@ class MainWindow(Gtk.Window):
         self.status_label.set_markup("<span color='#666666'><i>Ready</i></span>")
         main_box.pack_start(self.status_label, False, False, 5)
         
+        # Progress bar (shown while a background job runs)
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_no_show_all(True)
+        main_box.pack_start(self.progress_bar, False, False, 0)
+        
         # Embedded subtitles section
         embed_label = Gtk.Label()
         embed_label.set_markup("<span size='large' weight='bold'>📎 Embedded Subtitles</span>")
@@ -75,7 +93,7 @@ class MainWindow(Gtk.Window):
         main_box.pack_start(embed_label, False, False, 10)
         
         # Embedded subtitles list
-        self.embedded_store = Gtk.ListStore(str, str)  # Language, Size
+        self.embedded_store = Gtk.ListStore(str, str, str, str)  # Language, Size, Codec, Action
         self.embedded_view = Gtk.TreeView(model=self.embedded_store)
         
         lang_renderer = Gtk.CellRendererText()
@@ -86,6 +104,14 @@ class MainWindow(Gtk.Window):
         size_column = Gtk.TreeViewColumn("Size", size_renderer, text=1)
         self.embedded_view.append_column(size_column)
         
+        codec_renderer = Gtk.CellRendererText()
+        codec_column = Gtk.TreeViewColumn("Codec", codec_renderer, text=2)
+        self.embedded_view.append_column(codec_column)
+        
+        plan_renderer = Gtk.CellRendererText()
+        plan_column = Gtk.TreeViewColumn("Action", plan_renderer, text=3)
+        self.embedded_view.append_column(plan_column)
+        
         embed_scroll = Gtk.ScrolledWindow()
         embed_scroll.set_size_request(-1, 120)
         embed_scroll.set_shadow_type(Gtk.ShadowType.IN)
@@ -99,7 +125,7 @@ class MainWindow(Gtk.Window):
         main_box.pack_start(external_label, False, False, 10)
         
         # External subtitles list
-        self.external_store = Gtk.ListStore(str, str)  # Language, Size
+        self.external_store = Gtk.ListStore(str, str, str)  # Language, Size, Filename (hidden)
         self.external_view = Gtk.TreeView(model=self.external_store)
         
         lang_renderer2 = Gtk.CellRendererText()
@@ -121,7 +147,59 @@ class MainWindow(Gtk.Window):
         self.cleanup_button.set_size_request(-1, 50)
         self.cleanup_button.set_sensitive(False)  # Disabled until file is loaded
         self.cleanup_button.connect("clicked", self._on_cleanup_button_clicked)
-        main_box.pack_start(self.cleanup_button, False, False, 15)
+        
+        # Cancel button (shown while a background job runs)
+        self.cancel_button = Gtk.Button(label="✖ Cancel")
+        self.cancel_button.set_size_request(-1, 50)
+        self.cancel_button.set_no_show_all(True)
+        self.cancel_button.connect("clicked", self._on_cancel_button_clicked)
+        
+        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        button_box.pack_start(self.cleanup_button, True, True, 0)
+        button_box.pack_start(self.cancel_button, False, False, 0)
+        main_box.pack_start(button_box, False, False, 15)
+        
+        # Batch queue section (shown once files are queued)
+        self.queue_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        self.queue_box.set_no_show_all(True)
+        main_box.pack_start(self.queue_box, True, True, 5)
+        
+        queue_header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        queue_label = Gtk.Label()
+        queue_label.set_markup("<span size='large' weight='bold'>📋 Queue</span>")
+        queue_label.set_halign(Gtk.Align.START)
+        queue_header.pack_start(queue_label, True, True, 0)
+        
+        self.cancel_queue_button = Gtk.Button(label="✖ Cancel all")
+        self.cancel_queue_button.connect("clicked", self._on_cancel_queue_clicked)
+        queue_header.pack_start(self.cancel_queue_button, False, False, 0)
+        self.queue_box.pack_start(queue_header, False, False, 0)
+        
+        # Queue list
+        self.queue_store = Gtk.ListStore(int, str, str, int)  # Job id, File, Status, Progress
+        self.queue_view = Gtk.TreeView(model=self.queue_store)
+        self.queue_view.connect("row-activated", self._on_queue_row_activated)
+        
+        file_renderer = Gtk.CellRendererText()
+        file_column = Gtk.TreeViewColumn("File", file_renderer, text=1)
+        file_column.set_expand(True)
+        self.queue_view.append_column(file_column)
+        
+        status_renderer = Gtk.CellRendererText()
+        status_column = Gtk.TreeViewColumn("Status", status_renderer, text=2)
+        self.queue_view.append_column(status_column)
+        
+        progress_renderer = Gtk.CellRendererProgress()
+        progress_column = Gtk.TreeViewColumn("Progress", progress_renderer, value=3)
+        self.queue_view.append_column(progress_column)
+        
+        queue_scroll = Gtk.ScrolledWindow()
+        queue_scroll.set_size_request(-1, 150)
+        queue_scroll.set_shadow_type(Gtk.ShadowType.IN)
+        queue_scroll.add(self.queue_view)
+        self.queue_box.pack_start(queue_scroll, True, True, 0)
+        queue_header.show_all()
+        queue_scroll.show_all()
     
     def _setup_drag_and_drop(self):
         """Setup drag and drop functionality for the entire window."""
@@ -137,22 +215,74 @@ class MainWindow(Gtk.Window):
     def _on_file_dropped(self, widget, drag_context, x, y, data, info, time):
         """Handle file drop event."""
         uris = data.get_uris()
-        if uris:
-            file_path = uris[0].replace('file://', '')
-            # URL decode the path
-            import urllib.parse
-            file_path = urllib.parse.unquote(file_path)
+        if not uris:
+            return
+        
+        # URL decode the paths
+        paths = [urllib.parse.unquote(uri.replace('file://', '')) for uri in uris]
+        
+        # Several files or a folder: process them as a batch
+        if len(paths) > 1 or os.path.isdir(paths[0]):
+            print(f"Batch dropped: {len(paths)} item(s)")
+            # Leave the disks to the conversions
+            self._stop_track_scans()
+            if not self.queue.add(paths):
+                self._show_error("No MKV or MP4 files found in the dropped items.")
+            return
+        
+        if self._job_running():
+            self._show_error("A file is still being processed. Cancel it or wait until it finishes.")
+            return
+        
+        file_path = paths[0]
+        
+        if file_path.lower().endswith(('.mkv', '.mp4')):
+            print(f"File dropped: {file_path}")
+            self.load_file(file_path)
             
-            if file_path.lower().endswith(('.mkv', '.mp4')):
-                print(f"File dropped: {file_path}")
-                self.load_file(file_path)
-                
-                # Auto-convert if checkbox is checked
-                if self.auto_convert_check.get_active():
-                    print("Auto-convert is enabled, processing automatically...")
-                    self._on_cleanup_button_clicked(None)
-            else:
-                self._show_error("Invalid file type. Please drop an MKV or MP4 file.")
+            # Auto-convert if checkbox is checked
+            if self.auto_convert_check.get_active():
+                print("Auto-convert is enabled, processing automatically...")
+                self._on_cleanup_button_clicked(None)
+        else:
+            self._show_error("Invalid file type. Please drop an MKV or MP4 file.")
+    
+    def _on_queue_update_threaded(self, job):
+        """Forward queue updates from worker threads to the main loop."""
+        GLib.idle_add(self._on_queue_update, job.id, job.path, job.status, job.fraction)
+    
+    def _on_queue_update(self, job_id, path, status, fraction):
+        """Add or update the queue row for a job."""
+        progress = int(round(fraction * 100))
+        row = self.queue_rows.get(job_id)
+        if row is None:
+            tree_iter = self.queue_store.append([job_id, os.path.basename(path), status, progress])
+            self.queue_rows[job_id] = Gtk.TreeRowReference.new(
+                self.queue_store, self.queue_store.get_path(tree_iter)
+            )
+            self.queue_box.show()
+        else:
+            tree_iter = self.queue_store.get_iter(row.get_path())
+            self.queue_store.set(tree_iter, [2, 3], [status, progress])
+        return False
+    
+    def _on_queue_row_activated(self, view, tree_path, column):
+        """Show the subtitles of a queued file once it is finished."""
+        job_id = self.queue_store[tree_path][0]
+        job = next((job for job in self.queue.jobs if job.id == job_id), None)
+        if job is None or self._job_running():
+            return
+        
+        if job.state == QueueJob.RUNNING:
+            return
+        
+        file_path = job.result or job.path
+        if os.path.exists(file_path):
+            self.load_file(file_path)
+    
+    def _on_cancel_queue_clicked(self, button):
+        """Cancel every queued and running batch job."""
+        self.queue.cancel_all()
     
     def load_file(self, file_path):
         """Load and analyze a media file."""
@@ -161,32 +291,96 @@ class MainWindow(Gtk.Window):
         
         # Update media label
         filename = os.path.basename(file_path)
+        hint = "Click to open in VLC"
+        if file_path.lower().endswith('.mkv'):
+            hint += f" · Remux: {self._describe_conversion_plan(file_path)}"
         self.media_label.set_markup(
-            f"<span size='large' weight='bold'>🎬 {filename}</span>\n"
-            f"<span size='small' color='#666666'><i>Click to open in VLC</i></span>"
+            f"<span size='large' weight='bold'>🎬 {GLib.markup_escape_text(filename)}</span>\n"
+            f"<span size='small' color='#666666'><i>{GLib.markup_escape_text(hint)}</i></span>"
         )
         
         # Analyze file
         embedded_subs, external_subs = self.media_handler.analyze_file(file_path)
         
-        # Store current subtitle list for comparison
-        self.last_subtitle_list = [sub['filename'] for sub in external_subs if 'filename' in sub]
+        # Watch the directory for subtitle changes
+        self._watch_subtitles(file_path)
         
         # Update embedded subtitles list
         self.embedded_store.clear()
         for sub in embedded_subs:
-            self.embedded_store.append([sub['language'], sub['size']])
+            self.embedded_store.append([sub['language'], sub['size'], sub['codec'], PLAN_LABELS[sub['plan']]])
+        self._stop_track_scans()
+        self._scan_subtitle_sizes(file_path, embedded_subs)
+        self._sample_untagged_languages(file_path, embedded_subs)
         
         # Update external subtitles list
         self.external_store.clear()
         for sub in external_subs:
-            self.external_store.append([sub['language'], sub['size']])
+            self.external_store.append([sub['language'], sub['size'], sub['filename']])
         
         # Enable cleanup button
         self.cleanup_button.set_sensitive(True)
         
         self.status_label.set_markup("<i>Ready</i>")
     
+    def _scan_subtitle_sizes(self, file_path, embedded_subs):
+        """Measure embedded tracks without size tags in the background."""
+        if all(sub['bytes'] is not None for sub in embedded_subs):
+            return
+        
+        def on_done(sizes):
+            if sizes is None or file_path != self.current_file:
+                return
+            for row, sub in zip(self.embedded_store, embedded_subs):
+                if sub['bytes'] is None:
+                    size_bytes, cues = sizes.get(str(sub['index']), [0, 0])
+                    row[1] = describe_track_size(size_bytes, cues)
+        
+        self.size_scan_job = BackgroundJob(
+            lambda job: self.media_handler.scan_subtitle_sizes(file_path, job.cancel_event),
+            on_done=on_done
+        )
+        self.size_scan_job.start()
+    
+    def _sample_untagged_languages(self, file_path, embedded_subs):
+        """Identify untagged text tracks from samples of their cues in the background."""
+        positions = {id(sub): row for row, sub in enumerate(embedded_subs)}
+        
+        def on_done(identified):
+            if file_path != self.current_file:
+                return
+            for sub in identified:
+                self.embedded_store[positions[id(sub)]][0] = sub['language']
+        
+        self.language_sample_job = BackgroundJob(
+            lambda job: self.media_handler.identify_untagged_tracks(file_path, embedded_subs, job.cancel_event),
+            on_done=on_done
+        )
+        self.language_sample_job.start()
+    
+    def _stop_track_scans(self):
+        """
+        Cancel the background reads of the loaded file's tracks.
+        
+        They read the same disk as conversions, outside the per-device
+        limit, so they are stopped whenever a job starts.
+        """
+        if self.size_scan_job is not None:
+            self.size_scan_job.cancel()
+            self.size_scan_job = None
+        
+        if self.language_sample_job is not None:
+            self.language_sample_job.cancel()
+            self.language_sample_job = None
+    
+    def _describe_conversion_plan(self, file_path):
+        """Describe whether an MKV needs a copy-only remux or a partial transcode."""
+        try:
+            return describe_plan(plan_conversion(self.media_handler.probe(file_path)))
+        except Exception as e:
+            print(f"Could not plan conversion of {file_path}: {e}")
+            return "unknown"
+    
     def _on_media_label_clicked(self, widget, event):
         """Launch VLC when media label is clicked."""
         if self.current_file and os.path.exists(self.current_file):
@@ -199,85 +393,151 @@ class MainWindow(Gtk.Window):
     
     def _on_cleanup_button_clicked(self, button):
         """Handle cleanup button click (works for both MKV and MP4)."""
-        if not self.current_file:
+        if not self.current_file or self._job_running():
             return
         
+        if not self.current_file.lower().endswith(('.mkv', '.mp4')):
+            return
+        
+        self._stop_track_scans()
+        
         # Disable button during processing
         self.cleanup_button.set_sensitive(False)
         self.status_label.set_markup("<i>Processing...</i>")
         
-        try:
-            # If MKV, convert first then cleanup
-            if self.current_file.lower().endswith('.mkv'):
-                self._convert_and_cleanup_mkv()
-            # If MP4, just cleanup subtitles
-            elif self.current_file.lower().endswith('.mp4'):
-                self._cleanup_subtitles()
-        except Exception as e:
-            print(f"Error during processing: {e}")
-            self._show_error(f"Processing failed: {e}")
-            self.cleanup_button.set_sensitive(True)
-            self.status_label.set_markup("<i>Error</i>")
+        self.current_job = BackgroundJob(
+            self._process_current_file,
+            on_status=self._on_job_status,
+            on_progress=self._on_job_progress,
+            on_done=self._on_job_done,
+            on_error=self._on_job_error,
+            on_cancelled=self._on_job_cancelled
+        )
+        self._set_job_controls(True)
+        self.current_job.start()
     
-    def _convert_and_cleanup_mkv(self):
-        """Convert MKV to MP4, delete MKV, and cleanup subtitles."""
-        print("Starting MKV conversion and cleanup...")
-        
-        try:
-            mkv_file = self.current_file
-            output_file = convert_mkv_to_mp4(mkv_file)
-            print(f"Conversion complete: {output_file}")
-            
-            # Delete the MKV file
-            self._delete_mkv_file(mkv_file)
-            
-            # Reload with the new MP4 file
-            self.load_file(output_file)
-            
-            # Now cleanup subtitles
-            self._cleanup_subtitles()
-            
-        except Exception as e:
-            raise
+    def _on_cancel_button_clicked(self, button):
+        """Cancel the running background job."""
+        if self._job_running():
+            self.cancel_button.set_sensitive(False)
+            self.status_label.set_markup("<i>Cancelling...</i>")
+            self.current_job.cancel()
+    
+    def _job_running(self):
+        """Return True if a background job is in progress."""
+        return self.current_job is not None and self.current_job.is_running()
+    
+    def _set_job_controls(self, running):
+        """Show or hide the progress bar and cancel button."""
+        if running:
+            self.progress_bar.set_fraction(0.0)
+            self.progress_bar.show()
+            self.cancel_button.set_sensitive(True)
+            self.cancel_button.show()
+        else:
+            self._stop_pulsing()
+            self.progress_bar.hide()
+            self.cancel_button.hide()
+            self.cleanup_button.set_sensitive(self.current_file is not None)
+    
+    def _on_job_status(self, message):
+        """Show a status message from the background job."""
+        self.status_label.set_markup(f"<i>{GLib.markup_escape_text(message)}</i>")
+    
+    def _on_job_progress(self, fraction):
+        """Update the progress bar; None means indeterminate."""
+        if fraction is None:
+            if self.progress_timeout_id is None:
+                self.progress_timeout_id = GLib.timeout_add(100, self._pulse_progress)
+        else:
+            self._stop_pulsing()
+            self.progress_bar.set_fraction(max(0.0, min(1.0, fraction)))
+    
+    def _pulse_progress(self):
+        """Pulse the progress bar while progress is indeterminate."""
+        self.progress_bar.pulse()
+        return True
     
-    def _cleanup_subtitles(self):
-        """Cleanup MP4 subtitles: rename to .lang.srt format and remove duplicates."""
-        print("Starting subtitle cleanup...")
+    def _stop_pulsing(self):
+        """Stop the indeterminate progress animation."""
+        if self.progress_timeout_id is not None:
+            GLib.source_remove(self.progress_timeout_id)
+            self.progress_timeout_id = None
+    
+    def _on_job_done(self, result_file):
+        """Reload the UI once the background job has finished."""
+        self._set_job_controls(False)
+        self.load_file(result_file)
+        self.status_label.set_markup("<i>Complete! Files ready for Samsung TV</i>")
+    
+    def _on_job_error(self, error):
+        """Report a failed background job."""
+        print(f"Error during processing: {error}")
+        self._set_job_controls(False)
+        # Subtitles may have been extracted or renamed before the failure
+        self._reload_after_interrupted_job()
+        self._show_error(f"Processing failed: {error}")
+        self.status_label.set_markup("<i>Error</i>")
+    
+    def _on_job_cancelled(self):
+        """Report a cancelled background job."""
+        self._set_job_controls(False)
+        self._reload_after_interrupted_job()
+        self.status_label.set_markup("<i>Cancelled</i>")
+    
+    def _reload_after_interrupted_job(self):
+        """
+        Reload the current file after a job stopped early.
         
-        try:
-            process_mp4_subtitles(self.current_file)
-            print("Subtitle cleanup complete")
-            self.status_label.set_markup("<i>Complete! Files ready for Samsung TV</i>")
-            
-            # Reload to show updated subtitles
+        If the job got as far as releasing the MKV, the file now lives on as
+        the MP4 next to it, so that is loaded instead.
+        """
+        if not self.current_file:
+            return
+        if os.path.exists(self.current_file):
             self.load_file(self.current_file)
-        except Exception as e:
-            raise
+            return
+        
+        converted_file = os.path.splitext(self.current_file)[0] + '.mp4'
+        if os.path.exists(converted_file):
+            self.load_file(converted_file)
+    
+    def _process_current_file(self, job):
+        """Convert (if MKV) and cleanup subtitles of the current file (worker thread)."""
+        print("Starting cleanup...")
+        
+        def on_status(message):
+            job.report_status(message)
+            job.report_progress(None)
+        
+        def on_progress(progress):
+            job.report_progress(progress['fraction'])
+            job.report_status(f"Converting to MP4... {describe_progress(progress)}")
+        
+        from pipeline import process_media_file
+        
+        return process_media_file(
+            self.current_file,
+            self._release_source,
+            job.cancel_event,
+            on_status,
+            on_progress
+        )
+    
+    def _release_source(self, mkv_file):
+        """Delete the converted MKV from a worker thread, one dialog at a time."""
+        with self.release_lock:
+            run_on_main_thread(self._delete_mkv_file, mkv_file)
     
     def _delete_mkv_file(self, mkv_file):
         """Delete MKV file, either to .Trash or with confirmation."""
-        import shutil
-        
-        directory = os.path.dirname(mkv_file)
         filename = os.path.basename(mkv_file)
         
         # Check for .Trash folder on the volume
-        mount_point = self._get_mount_point(directory)
-        trash_dir = os.path.join(mount_point, '.Trash')
-        
-        if os.path.exists(trash_dir) and os.path.isdir(trash_dir):
+        if find_trash_dir(mkv_file) is not None:
             # Move to trash
             try:
-                trash_path = os.path.join(trash_dir, filename)
-                # Handle name collision in trash
-                counter = 1
-                while os.path.exists(trash_path):
-                    base, ext = os.path.splitext(filename)
-                    trash_path = os.path.join(trash_dir, f"{base}_{counter}{ext}")
-                    counter += 1
-                
-                print(f"Moving {mkv_file} to {trash_path}")
-                shutil.move(mkv_file, trash_path)
+                move_to_trash(mkv_file)
                 print(f"MKV file moved to trash")
             except Exception as e:
                 print(f"Error moving to trash: {e}")
@@ -301,6 +561,7 @@ class MainWindow(Gtk.Window):
                 try:
                     print(f"Deleting {mkv_file}")
                     os.remove(mkv_file)
+                    record_file_removed(mkv_file)
                     print("MKV file deleted")
                 except Exception as e:
                     print(f"Error deleting file: {e}")
@@ -308,33 +569,54 @@ class MainWindow(Gtk.Window):
             else:
                 print("MKV file deletion cancelled by user")
     
-    def _get_mount_point(self, path):
-        """Get the mount point for a given path, resolving symlinks."""
-        # Resolve all symbolic links first
-        path = os.path.realpath(path)
-        path = os.path.abspath(path)
-        
-        while not os.path.ismount(path):
-            parent = os.path.dirname(path)
-            if parent == path:
-                # Reached root
-                break
-            path = parent
-        return path
-    
-    def _on_window_focus(self, window, event):
-        """Check for new/changed subtitles when window gains focus."""
-        if not self.current_file or not os.path.exists(self.current_file):
+    def _watch_subtitles(self, file_path):
+        """Start watching the file's directory for subtitle changes."""
+        if self.subtitle_watcher is not None:
+            if self.subtitle_watcher.directory == os.path.dirname(file_path) and \
+                    self.subtitle_watcher.basename == os.path.splitext(os.path.basename(file_path))[0]:
+                return
+            self.subtitle_watcher.stop()
+            self.subtitle_watcher = None
+        
+        try:
+            self.subtitle_watcher = SubtitleWatcher(file_path, self._on_subtitles_changed)
+        except Exception as e:
+            print(f"Could not watch directory for subtitle changes: {e}")
+    
+    def _on_subtitles_changed(self, added, removed):
+        """Update the external subtitles list incrementally."""
+        # Files are in flux while a job runs; the job reloads when done
+        if self._job_running():
             return
         
-        # Get current external subtitles
-        _, external_subs = self.media_handler.analyze_file(self.current_file)
-        current_subtitle_list = [sub['filename'] for sub in external_subs if 'filename' in sub]
+        directory = self.subtitle_watcher.directory
         
-        # Check if subtitle list has changed
-        if set(current_subtitle_list) != set(self.last_subtitle_list):
-            print("Subtitle files changed, reloading...")
-            self.load_file(self.current_file)
+        changed = set(added) | set(removed)
+        tree_iter = self.external_store.get_iter_first()
+        while tree_iter is not None:
+            if self.external_store[tree_iter][2] in changed:
+                # remove() moves the iter to the next row
+                if not self.external_store.remove(tree_iter):
+                    tree_iter = None
+            else:
+                tree_iter = self.external_store.iter_next(tree_iter)
+        
+        for filename in added:
+            try:
+                sub = self.media_handler.describe_external_subtitle(os.path.join(directory, filename))
+            except OSError as e:
+                print(f"Error reading new subtitle {filename}: {e}")
+                continue
+            self.external_store.append([sub['language'], sub['size'], sub['filename']])
+    
+    def _on_destroy(self, widget):
+        """Stop background work when the window goes away."""
+        self.queue.shutdown()
+        self._stop_track_scans()
+        
+        if self.subtitle_watcher is not None:
+            self.subtitle_watcher.stop()
+            self.subtitle_watcher = None
     
     def _show_error(self, message):
         """Show error dialog."""
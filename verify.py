@@ -0,0 +1,151 @@
+"""
+Fast post-remux verification of an MP4 against its source MKV
+"""
+import json
+import subprocess
+
+from media_handler import get_statistics_tag
+from tv_profile import plan_conversion
+
+
+# Allowed duration difference: the larger of an absolute and a relative bound
+DURATION_TOLERANCE_SECONDS = 1.0
+DURATION_TOLERANCE_RATIO = 0.005
+
+# Packet sampling: where to seek (fraction of the duration) and how many
+# packets to hash there
+SAMPLE_OFFSETS = (0.1, 0.5, 0.9)
+SAMPLE_PACKETS = 8
+
+
+def verify_remux(media_handler, source_path, output_path, sample_packets=True):
+    """
+    Check that a remuxed MP4 holds the same streams as its source.
+    
+    Only container metadata is compared (duration, stream counts, codecs
+    and, where both files record them, frame counts); optionally a few
+    video packets are hashed at fixed offsets in both files. Nothing is
+    decoded, so this takes seconds even for large files.
+    
+    Args:
+        media_handler: MediaHandler used for probing
+        source_path: Path of the source MKV
+        output_path: Path of the remuxed MP4
+        sample_packets: Also compare sampled video packet checksums
+    
+    Returns:
+        list: Problems found (empty if the MP4 passed)
+    """
+    try:
+        source = media_handler.probe(source_path)
+        output = media_handler.probe(output_path)
+    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+        return [f"could not probe: {e}"]
+    
+    problems = []
+    
+    # Duration
+    try:
+        source_duration = float(source['format']['duration'])
+        output_duration = float(output['format']['duration'])
+        tolerance = max(DURATION_TOLERANCE_SECONDS, source_duration * DURATION_TOLERANCE_RATIO)
+        if abs(source_duration - output_duration) > tolerance:
+            problems.append(f"duration {output_duration:.1f}s, expected {source_duration:.1f}s")
+    except (KeyError, TypeError, ValueError):
+        problems.append("duration unknown")
+    
+    # Streams, in output order (the remux maps all video, then all audio)
+    plan = plan_conversion(source)
+    transcoded = {entry['index']: entry['target']['codec'] for entry in plan['audio'] if entry['transcode']}
+    expected = _streams_of(source, ('video',)) + _streams_of(source, ('audio',))
+    actual = _streams_of(output, ('video', 'audio'))
+    
+    if len(expected) != len(actual):
+        problems.append(f"{len(actual)} video/audio streams, expected {len(expected)}")
+        return problems
+    
+    for source_stream, output_stream in zip(expected, actual):
+        index = source_stream.get('index')
+        codec = transcoded.get(index, source_stream.get('codec_name'))
+        if output_stream.get('codec_name') != codec:
+            problems.append(f"stream {index}: codec {output_stream.get('codec_name')}, expected {codec}")
+            continue
+        
+        if index in transcoded:
+            continue
+        
+        source_frames = get_statistics_tag(source_stream.get('tags', {}), 'NUMBER_OF_FRAMES')
+        output_frames = _parse_int(output_stream.get('nb_frames'))
+        if source_frames is not None and output_frames is not None and source_frames != output_frames:
+            problems.append(f"stream {index}: {output_frames} packets, expected {source_frames}")
+    
+    if sample_packets and not problems:
+        problems.extend(_compare_packet_samples(source_path, output_path, source))
+    
+    return problems
+
+
+def _compare_packet_samples(source_path, output_path, source):
+    """
+    Hash a few video packets at fixed offsets in both files.
+    
+    Seeking lands on a keyframe in each file, not necessarily the same one,
+    so a wider window is read from the source and each output sample must
+    share packets with it.
+    """
+    try:
+        duration = float(source['format']['duration'])
+    except (KeyError, TypeError, ValueError):
+        return []
+    
+    problems = []
+    for fraction in SAMPLE_OFFSETS:
+        start = duration * fraction
+        try:
+            source_hashes = _hash_packets(source_path, start, SAMPLE_PACKETS * 4)
+            output_hashes = _hash_packets(output_path, start, SAMPLE_PACKETS)
+        except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+            problems.append(f"could not sample packets at {start:.0f}s: {e}")
+            continue
+        
+        if output_hashes and not set(output_hashes) & set(source_hashes):
+            problems.append(f"video packets at {start:.0f}s differ from the source")
+    
+    return problems
+
+
+def _hash_packets(file_path, start, count):
+    """
+    Hash the first video packets after a seek.
+    
+    Returns:
+        list: CRC32 data hashes of the packets
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'quiet',
+        '-select_streams', 'v:0',
+        '-read_intervals', f"{start:.3f}%+#{count}",
+        '-show_packets',
+        '-show_data_hash', 'crc32',
+        '-show_entries', 'packet=data_hash',
+        '-print_format', 'json',
+        file_path
+    ]
+    
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    packets = json.loads(result.stdout).get('packets', [])
+    return [packet['data_hash'] for packet in packets if 'data_hash' in packet]
+
+
+def _streams_of(probe_data, codec_types):
+    """Get the streams of the given types, in file order."""
+    return [stream for stream in probe_data.get('streams', []) if stream.get('codec_type') in codec_types]
+
+
+def _parse_int(value):
+    """Parse an ffprobe integer field (which may be missing or 'N/A')."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
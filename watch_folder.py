@@ -0,0 +1,123 @@
+"""
+Watch-folder daemon: process media files once they stop growing
+"""
+import os
+import time
+
+from processing_queue import collect_media_files, QueueJob
+from probe_cache import file_identity
+
+
+# Seconds between directory scans
+DEFAULT_POLL_INTERVAL = 10
+
+# Seconds a file's size and mtime must stay unchanged before processing
+DEFAULT_SETTLE_TIME = 30
+
+
+class IncomingFolderWatcher:
+    """
+    Polls an incoming folder and queues media files once they are complete.
+    
+    A file is considered complete when its size and mtime have not changed
+    for settle_time seconds. Files are only queued once per identity, and
+    the MP4s produced by processing are not picked up again.
+    """
+    
+    def __init__(self, queue, folder, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_time=DEFAULT_SETTLE_TIME):
+        """
+        Args:
+            queue: ProcessingQueue that processes the files
+            folder: Folder to watch (searched recursively)
+            poll_interval: Seconds between scans
+            settle_time: Seconds a file must stay unchanged before processing
+        """
+        self.queue = queue
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self._candidates = {}  # path -> (identity, first seen with that identity)
+        self._handled = {}  # path -> identity already queued or produced
+        self._jobs = []
+    
+    def run(self, stop_event):
+        """
+        Scan the folder until stop_event is set.
+        
+        Args:
+            stop_event: threading.Event that ends the loop
+        """
+        print(f"Watching {self.folder} (every {self.poll_interval}s, settle {self.settle_time}s)")
+        while not stop_event.is_set():
+            self.poll_once()
+            stop_event.wait(self.poll_interval)
+    
+    def poll_once(self):
+        """
+        Scan the folder once and queue files that have stopped growing.
+        
+        Returns:
+            list: Paths queued during this scan
+        """
+        busy = self._collect_finished_jobs()
+        
+        now = time.monotonic()
+        ready = []
+        seen = set()
+        
+        for path in collect_media_files([self.folder]):
+            seen.add(path)
+            if path in busy:
+                # Written by a job still running (its MP4 appears before the job ends)
+                continue
+            identity = file_identity(path)
+            if identity is None or self._handled.get(path) == identity:
+                continue
+            
+            previous = self._candidates.get(path)
+            if previous is None or previous[0] != identity:
+                # New or still changing: restart the settle timer
+                self._candidates[path] = (identity, now)
+                continue
+            
+            if now - previous[1] >= self.settle_time:
+                ready.append(path)
+                self._handled[path] = identity
+                del self._candidates[path]
+        
+        # Forget files that disappeared
+        for path in list(self._candidates):
+            if path not in seen:
+                del self._candidates[path]
+        
+        if ready:
+            self._jobs.extend(self.queue.add(ready))
+        
+        return ready
+    
+    def _collect_finished_jobs(self):
+        """
+        Remember the outputs of finished jobs so they are not reprocessed.
+        
+        Returns:
+            set: Paths read or written by the jobs still running (the
+                source and the MP4 it becomes)
+        """
+        still_running = []
+        busy = set()
+        for job in self._jobs:
+            if not job.is_finished():
+                still_running.append(job)
+                busy.add(job.path)
+                busy.add(os.path.splitext(job.path)[0] + '.mp4')
+                continue
+            
+            if job.state == QueueJob.DONE and job.result:
+                identity = file_identity(job.result)
+                if identity is not None:
+                    self._handled[job.result] = identity
+            print(f"{os.path.basename(job.path)}: {job.status}")
+        
+        self._jobs = still_running
+        return busy